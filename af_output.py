@@ -0,0 +1,46 @@
+import sys
+
+import numpy as np
+
+### Output of the AFs computed by main.py (option -om)
+## full -> the whole AF, in the apx format
+## diff -> only the attacks added to (+att(a,b).) and removed from (-att(a,b).) the initial AF,
+## such a patch can be applied to the initial AF with apply_patch (see apply_patch.py)
+### The lines are written one at a time through a buffered writer, the whole output is never built as a string.
+
+output_modes_list = ["full", "diff"]
+
+# Returns a buffered writer on the output file, or the standard output if output_file is None
+def open_output(output_file, buffer_size=1 << 20):
+    if output_file == None:
+        return sys.stdout
+    return open(output_file, 'w', buffering=buffer_size)
+
+def close_output(writer):
+    if writer is sys.stdout:
+        writer.flush()
+    else:
+        writer.close()
+
+# Writes the AF given by its attack matrix, i.e. attack_matrix[i][j] is True iff args[i] attacks args[j]
+def write_af(writer, args, attack_matrix):
+    writer.writelines(f"arg({argument}).\n" for argument in args)
+    writer.writelines(f"att({args[i]},{args[j]}).\n" for i, j in zip(*np.nonzero(attack_matrix)))
+
+# Writes the attacks added and removed between the initial AF and the AF given by its attack matrix
+def write_af_diff(writer, args, attack_matrix, initial_attack_matrix):
+    writer.writelines(f"+att({args[i]},{args[j]}).\n" for i, j in zip(*np.nonzero(attack_matrix & ~initial_attack_matrix)))
+    writer.writelines(f"-att({args[i]},{args[j]}).\n" for i, j in zip(*np.nonzero(initial_attack_matrix & ~attack_matrix)))
+
+# Returns the attacks of the AF obtained by adding the attacks in added and removing the ones in removed
+# from the attacks atts of the base AF (the attacks are pairs [attacker, target], as given by pygarg.parser)
+def apply_patch(atts, added, removed):
+    removed_set = set((att[0], att[1]) for att in removed)
+    patched_atts = []
+    patched_set = set()
+    for att in atts + added:
+        pair = (att[0], att[1])
+        if pair not in removed_set and pair not in patched_set:
+            patched_set.add(pair)
+            patched_atts.append([att[0], att[1]])
+    return patched_atts
@@ -0,0 +1,24 @@
+### Applies a patch written by main.py with -om diff (see af_output.py) to the base AF,
+### and prints the patched AF in the apx format
+
+import argparse
+
+import pygarg.parser as parser
+
+import af_output
+import util
+
+argparser = argparse.ArgumentParser()
+argparser.add_argument("af_file", help="the file containing the base AF")
+argparser.add_argument("patch_file", help="the file containing the added (+att(a,b).) and removed (-att(a,b).) attacks")
+argparser.add_argument("-o", "--output", help="the output file for printing the patched AF (the standard output is used if this option is not set)")
+cli_args = argparser.parse_args()
+
+args, atts = parser.parse(cli_args.af_file)
+added, removed = util.parse_patch_file(cli_args.patch_file)
+patched_atts = af_output.apply_patch(atts, added, removed)
+
+writer = af_output.open_output(cli_args.output)
+writer.writelines(f"arg({argument}).\n" for argument in args)
+writer.writelines(f"att({att[0]},{att[1]}).\n" for att in patched_atts)
+af_output.close_output(writer)
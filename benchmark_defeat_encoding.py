@@ -0,0 +1,43 @@
+### Comparison of the full and compact encodings of stability (option -de of main.py)
+### For each instance, main.py is run once per encoding and the number of SAT variables, the number of clauses,
+### the time spent in the solver and the total time are printed, one CSV line per run.
+
+import sys
+import subprocess
+import argparse
+
+defeat_encodings_list = ["full", "compact"]
+
+argparser = argparse.ArgumentParser()
+argparser.add_argument("instances", nargs="+", help="the instances, given as pairs af_file:query_file")
+argparser.add_argument("-p", "--problem", help="the problem given to main.py (default: CEnfNS-ST)", default="CEnfNS-ST")
+argparser.add_argument("-ne", "--nextensions", help="the number of extensions given to main.py (default: the one chosen by main.py)")
+argparser.add_argument("-t", "--timeout", help="the time limit for each run, in seconds (default: 600)", default="600")
+cli_args = argparser.parse_args()
+
+# Returns the value of the line "name = value" in the output of main.py, or None if there is no such line
+def statistic(output_lines, name):
+    for line in output_lines:
+        if line.startswith(f"{name} = "):
+            return line[len(name) + 3:]
+    return None
+
+print("instance,encoding,nb_SAT_variables,nb_clauses,solving_time,total_time,result,cost")
+for instance in cli_args.instances:
+    if ":" not in instance:
+        sys.exit(f"Instance {instance} should be given as af_file:query_file")
+    af_file, query_file = instance.split(":")
+    for defeat_encoding in defeat_encodings_list:
+        command = [sys.executable, "main.py", af_file, query_file, "-p", cli_args.problem, "-v", "-de", defeat_encoding]
+        if cli_args.nextensions != None:
+            command += ["-ne", cli_args.nextensions]
+        try:
+            run = subprocess.run(command, capture_output=True, text=True, timeout=float(cli_args.timeout))
+        except subprocess.TimeoutExpired:
+            print(f"{instance},{defeat_encoding},,,,,TIMEOUT,")
+            continue
+        if run.returncode != 0:
+            sys.exit(f"main.py failed on {instance}:\n{run.stderr}")
+        output_lines = run.stdout.splitlines()
+        result, total_time, cost = output_lines[-1].split(",")
+        print(f"{instance},{defeat_encoding},{statistic(output_lines, 'nb_SAT_variables')},{statistic(output_lines, 'nb_clauses')},{statistic(output_lines, 'solving_time')},{total_time},{result},{cost}")
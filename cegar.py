@@ -0,0 +1,135 @@
+import time
+
+from pysat.solvers import Solver
+from pysat.examples.fm import FM
+from pysat.examples.rc2 import RC2
+from pysat.formula import WCNF
+
+### Engines used for solving the abstraction in the CEGAR loop of main.py
+### Each engine is built once from the initial clauses, then refined by adding clauses
+### between two calls to solve(). It keeps track of:
+## nb_iterations -> the number of calls to solve()
+## building_time -> the time spent loading clauses into the underlying solver
+## solving_time -> the time spent in the underlying solver
+### The MaxSAT engines also provide the cost of the last model returned by solve()
+
+
+### Incremental SAT engine for the decision problems
+### A single solver is kept alive during the whole CEGAR loop, so that the clauses
+### learned in one iteration are kept for the next ones
+class SATEngine():
+
+    def __init__(self, clauses, solver_name='g4'):
+        self.nb_iterations = 0
+        self.building_time = 0
+        self.solving_time = 0
+
+        time_start = time.time()
+        self.solver = Solver(name=solver_name)
+        self.solver.append_formula(clauses)
+        self.building_time += time.time() - time_start
+
+    def add_clause(self, clause):
+        time_start = time.time()
+        self.solver.add_clause(clause)
+        self.building_time += time.time() - time_start
+
+    # Returns a model of the current formula under the assumptions, or None if it is unsatisfiable
+    def solve(self, assumptions=[]):
+        self.nb_iterations += 1
+        time_start = time.time()
+        result = self.solver.solve(assumptions=assumptions)
+        self.solving_time += time.time() - time_start
+        if result:
+            return self.solver.get_model()
+        return None
+
+    def delete(self):
+        self.solver.delete()
+
+
+### Incremental MaxSAT engine for the optimization problems
+### A single RC2 instance is kept alive during the whole CEGAR loop: refinement clauses are
+### added as hard clauses, and the cores and lower bounds found so far are reused in the next iterations
+class RC2Engine():
+
+    def __init__(self, hard_clauses, soft_clauses, solver_name='g4'):
+        self.nb_iterations = 0
+        self.building_time = 0
+        self.solving_time = 0
+        self.cost = None
+
+        time_start = time.time()
+        wcnf = WCNF()
+        wcnf.extend(hard_clauses)
+        wcnf.extend(soft_clauses, weights=[1] * len(soft_clauses))
+        self.solver = RC2(wcnf, solver=solver_name, adapt=True, exhaust=True, minz=True, verbose=0)
+        self.building_time += time.time() - time_start
+
+    def add_clause(self, clause):
+        time_start = time.time()
+        self.solver.add_clause(clause)
+        self.building_time += time.time() - time_start
+
+    # Returns an optimal model of the current formula, or None if its hard part is unsatisfiable
+    def solve(self):
+        self.nb_iterations += 1
+        time_start = time.time()
+        model = self.solver.compute()
+        self.solving_time += time.time() - time_start
+        if model != None:
+            self.cost = self.solver.cost
+        else:
+            self.cost = None
+        return model
+
+    def delete(self):
+        self.solver.delete()
+
+
+### Non-incremental MaxSAT engine for the optimization problems
+### A new FM instance is built from the whole WCNF formula at each iteration
+class FMEngine():
+
+    def __init__(self, hard_clauses, soft_clauses):
+        self.nb_iterations = 0
+        self.building_time = 0
+        self.solving_time = 0
+        self.cost = None
+
+        time_start = time.time()
+        self.wcnf = WCNF()
+        for clause in hard_clauses:
+            self.wcnf.append(clause)
+        for soft_clause in soft_clauses:
+            self.wcnf.append(soft_clause, weight=1)
+        self.building_time += time.time() - time_start
+
+    def add_clause(self, clause):
+        self.wcnf.append(clause)
+
+    def solve(self):
+        self.nb_iterations += 1
+        time_start = time.time()
+        s = FM(self.wcnf, verbose = 0)
+        self.building_time += time.time() - time_start
+
+        time_start = time.time()
+        model = None
+        self.cost = None
+        if s.compute():
+            model = s.model
+            self.cost = s.cost
+        self.solving_time += time.time() - time_start
+        s.delete()
+        return model
+
+    def delete(self):
+        pass
+
+
+# Prints the statistics of an engine to the standard output
+def print_statistics(engine):
+    print(f"nb_iterations = {engine.nb_iterations}")
+    print(f"building_time = {engine.building_time}")
+    print(f"solving_time = {engine.solving_time}")
@@ -0,0 +1,89 @@
+import sys
+from array import array
+
+### Streaming destinations for the clauses of the encoders of credulous_encoding.py
+### They can be used instead of the list of clauses built in main.py (they support append, += and len),
+### so that the whole list of clauses never has to be materialized as Python lists of ints.
+### Both keep track of the memory that the list of clauses would have used (list_memory, an estimate in bytes).
+
+# Estimated memory used by a clause stored in a list of clauses: the list object,
+# its pointer in the outer list and one int object per literal
+def clause_memory(clause):
+    return sys.getsizeof(clause) + 8 + 28 * len(clause)
+
+
+### Sends each clause to an engine of cegar.py as soon as it is produced
+class EngineSink():
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.nb_clauses = 0
+        self.list_memory = 0
+
+    def append(self, clause):
+        self.engine.add_clause(clause)
+        self.nb_clauses += 1
+        self.list_memory += clause_memory(clause)
+
+    def __iadd__(self, clauses):
+        for clause in clauses:
+            self.append(clause)
+        return self
+
+    def __len__(self):
+        return self.nb_clauses
+
+    def saved_memory(self):
+        return self.list_memory
+
+
+### Packs the clauses into a flat array of 32-bit literals, each clause being terminated by 0 (as in the DIMACS format)
+### Iterating over the buffer yields the clauses as lists, one at a time, so it can be given to an engine of cegar.py.
+class ClauseBuffer():
+
+    def __init__(self):
+        self.literals = array('i')
+        self.nb_clauses = 0
+        self.list_memory = 0
+
+    def append(self, clause):
+        self.literals.extend(clause)
+        self.literals.append(0)
+        self.nb_clauses += 1
+        self.list_memory += clause_memory(clause)
+
+    def __iadd__(self, clauses):
+        for clause in clauses:
+            self.append(clause)
+        return self
+
+    def __len__(self):
+        return self.nb_clauses
+
+    def __iter__(self):
+        clause = []
+        for literal in self.literals:
+            if literal == 0:
+                yield clause
+                clause = []
+            else:
+                clause.append(literal)
+
+    def saved_memory(self):
+        return self.list_memory - self.literals.buffer_info()[1] * self.literals.itemsize
+
+
+# Adds the clauses given as the rows of an integer array (see the vectorized encoders of credulous_encoding.py)
+# to a list or a streaming destination, converting at most chunk_size rows to Python lists at a time
+def extend_with_array(destination, clause_array, chunk_size=65536):
+    for start in range(0, len(clause_array), chunk_size):
+        destination += clause_array[start:start+chunk_size].tolist()
+
+
+# Returns the peak memory (resident set size) of the process in kilobytes, or None if it is not available
+def peak_memory():
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
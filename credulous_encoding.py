@@ -1,5 +1,7 @@
 import pygarg.solvers as solvers
 
+import numpy as np
+
 from util import *
 
 ### Creation of the SAT solver variables
@@ -12,6 +14,8 @@ from util import *
 ##### which is true if b_i attacks a_i and b_i belongs to the extension E_X'
 ##### Intuition: b_i defeats a_i in the extension E_X'
 ## def_{bi,ai, E_X'} -> (k*m + k*k) + (i-1)*k + X
+# The index i of an argument is given by args.index, which is a constant-time lookup
+# when args is a util.ArgumentList (built once per instance in main.py).
 
 
 def membership_SAT_variables(argument, extension, args, nb_updated_extensions):
@@ -37,52 +41,127 @@ def defeat_SAT_variables(attacker, target, extension, args, nb_updated_extension
 
 
 # Ensures that an argument which is not self-attacking in the initial theory will not become so in the updated theory
-def encode_no_self_attacks(args,atts,extension, nb_updated_extensions):
-    clauses = []
+def encode_no_self_attacks(args,atts,extension, nb_updated_extensions, sink=None, fixed_attacks={}):
+    att_set = set((att[0], att[1]) for att in atts)
+    clauses = clause_destination(sink)
     for argument in args:
-        if [argument,argument] not in atts:
+        if (argument,argument) not in att_set and (argument,argument) not in fixed_attacks:
             clauses.append([-r_SAT_variables(argument, argument, extension, args, nb_updated_extensions)])
     return clauses
 
         
+### Choice of the number m of extensions
+## Returns a small number of extensions for accepting all the arguments in required_args and the sets of arguments
+## in conjunctive_positive: these arguments and sets are greedily covered with the initial extensions, and the ones
+## that no initial extension covers are assumed to need new extensions.
+## At least one extension per argument of the largest set in conjunctive_negative is kept, as in the default choice of m.
+## This is only a heuristic, not a sufficient number: the enforcement may be UNSAT with this number of extensions
+## although it is SAT with a larger one (e.g. the default one), and the optimal cost may be higher than with a larger one.
+def greedy_nb_extensions(required_args, conjunctive_positive, conjunctive_negative, initial_extensions):
+    uncovered = []
+    for argname in required_args:
+        if [argname] not in uncovered:
+            uncovered.append([argname])
+    uncovered += conjunctive_positive
+
+    nb_extensions = 0
+    while len(uncovered) > 0:
+        best_covered = []
+        for extension in initial_extensions:
+            covered = [conjunct for conjunct in uncovered if contains_all(extension, conjunct)]
+            if len(covered) > len(best_covered):
+                best_covered = covered
+        if len(best_covered) == 0:
+            break
+        nb_extensions += 1
+        uncovered = [conjunct for conjunct in uncovered if conjunct not in best_covered]
+
+    nb_uncovered_conjuncts = len([conjunct for conjunct in uncovered if conjunct in conjunctive_positive])
+    if nb_uncovered_conjuncts > 0:
+        nb_extensions += nb_uncovered_conjuncts
+    elif len(uncovered) > 0:
+        nb_extensions += 1
+
+    for conjunct in conjunctive_negative:
+        nb_extensions = max(nb_extensions, len(conjunct))
+    return max(nb_extensions, 1)
+
+
+### Destination of the clauses
+## The encoders below add their clauses to sink when it is given (a list of clauses, or one of the streaming
+## destinations of clause_sink.py which send the clauses to the solver or pack them into a flat buffer),
+## and to a new list otherwise. They return the object the clauses were added to.
+def clause_destination(sink):
+    if sink == None:
+        return []
+    return sink
+
+
 ### Encode POSITIVE target
-def encode_target(target,args, nb_updated_extensions, updated_extensions, DEBUG=False):
+def encode_target(target,args, nb_updated_extensions, updated_extensions, DEBUG=False, sink=None):
     if DEBUG:
         print("-- Positive target")
     ## Clause 1 from paper, one for each argument in the target
-    clauses = []
+    clauses = clause_destination(sink)
     for argname in target:
         new_clause = []
         for X in updated_extensions:
             new_clause.append(membership_SAT_variables(argname, X, args, nb_updated_extensions))
         clauses.append(new_clause)
         if DEBUG:
-            print(clauses[-1])
+            print(new_clause)
     if DEBUG:
         print("--")
     return clauses
 
 ### Encode NEGATIVE target
-def encode_negative_target(neg_target,args, nb_updated_extensions, updated_extensions, DEBUG=False):
+def encode_negative_target(neg_target,args, nb_updated_extensions, updated_extensions, DEBUG=False, sink=None):
     ## For each argument in the negative target, and each extension, add one unit clause to say that the argument is not in the extension
     if DEBUG:
         print("-- Negative target")
-    clauses = []
+    clauses = clause_destination(sink)
     for argname in neg_target:
         for X in updated_extensions:
-            clauses.append([-membership_SAT_variables(argname, X, args, nb_updated_extensions)])
+            new_clause = [-membership_SAT_variables(argname, X, args, nb_updated_extensions)]
+            clauses.append(new_clause)
             if DEBUG:
-                print(clauses[-1])
+                print(new_clause)
 
     if DEBUG:
         print("--")
     return clauses
 
+### Encode POSITIVE conjunctive targets
+def encode_positive_conjuncts(conjunctive_positive, args, nb_updated_extensions, updated_extensions, top_id, DEBUG=False, sink=None):
+    ## For each set of arguments in conjunctive_positive, some extension contains all of them
+    ## One new variable y_{i,E_X'} is created for each set and each extension, which is true iff the i-th set is included in the extension,
+    ## the new variables are numbered from top_id + 1
+    ## Returns the clauses and the last variable used
+    if DEBUG:
+        print("-- Positive conjunctive targets")
+    clauses = clause_destination(sink)
+    for conjunct in conjunctive_positive:
+        new_clause = []
+        for X in updated_extensions:
+            top_id += 1
+            for argname in conjunct:
+                implication = [-top_id, membership_SAT_variables(argname, X, args, nb_updated_extensions)]
+                clauses.append(implication)
+                if DEBUG:
+                    print(implication)
+            new_clause.append(top_id)
+        clauses.append(new_clause)
+        if DEBUG:
+            print(new_clause)
+    if DEBUG:
+        print("--")
+    return clauses, top_id
+
 ### Encode remaining credulously accepted arguments
-def remaining_credulously_accepted_arguments(args, neg_target, nb_updated_extensions, updated_extensions, initial_extensions, DEBUG=False):
+def remaining_credulously_accepted_arguments(args, neg_target, nb_updated_extensions, updated_extensions, initial_extensions, DEBUG=False, sink=None):
     if DEBUG:
         print("-- Credulously accepted arguments remain")
-    clauses = []
+    clauses = clause_destination(sink)
     # Clauses 2 from paper
     for argument in args:
         if (argument not in neg_target) and is_credulously_accepted(argument, initial_extensions):
@@ -91,88 +170,392 @@ def remaining_credulously_accepted_arguments(args, neg_target, nb_updated_extens
                 new_clause.append(membership_SAT_variables(argument, X, args, nb_updated_extensions))
             clauses.append(new_clause)
             if DEBUG:
-                print(clauses[-1])
+                print(new_clause)
     if DEBUG:
         print("--")
     return clauses
 
 ### Encode strict version
-def strict_version(target, args, nb_updated_extensions, updated_extensions, initial_extensions, DEBUG=False):
+def strict_version(target, args, nb_updated_extensions, updated_extensions, initial_extensions, DEBUG=False, sink=None):
     # Clauses 3 from paper, only for strict
     if DEBUG:
         print("-- Strict version: no new credulously accepted argument")    
-    clauses = []
+    clauses = clause_destination(sink)
     for argument in args:
         if (argument not in target) and (not is_credulously_accepted(argument, initial_extensions)):
             for X in updated_extensions:
-                clauses.append([-membership_SAT_variables(argument, X, args, nb_updated_extensions)])
+                new_clause = [-membership_SAT_variables(argument, X, args, nb_updated_extensions)]
+                clauses.append(new_clause)
                 if DEBUG:
-                    print(clauses[-1])
+                    print(new_clause)
     if DEBUG:
         print("--")
     return clauses
 
 
+### Symmetry breaking
+## The extensions E_1',...,E_m' are interchangeable, so each solution appears (up to) m! times.
+## Pinning: the j-th argument in required_args (i.e. arguments which must belong to some extension) belongs to one of E_1',...,E_j'
+## Any solution can be turned into a solution satisfying these clauses by reordering its extensions.
+def encode_symmetry_breaking_pin(required_args, args, nb_updated_extensions, updated_extensions, DEBUG=False, sink=None):
+    if DEBUG:
+        print("-- Symmetry breaking: pinned arguments")
+    clauses = clause_destination(sink)
+    pinned_args = []
+    for argname in required_args:
+        if argname not in pinned_args:
+            pinned_args.append(argname)
+    for j in range(min(len(pinned_args), len(updated_extensions) - 1)):
+        new_clause = []
+        for X in updated_extensions[:j+1]:
+            new_clause.append(membership_SAT_variables(pinned_args[j], X, args, nb_updated_extensions))
+        clauses.append(new_clause)
+        if DEBUG:
+            print(new_clause)
+    if DEBUG:
+        print("--")
+    return clauses
+
+## Lexicographic ordering: the membership vector of E_X' is lexicographically greater than or equal to the one of E_{X+1}'
+## One new variable e_{X,i} is created for each extension (but the last one) and each argument a_i (but the last one),
+## which is true if E_X' and E_{X+1}' contain the same arguments among a_1,...,a_i.
+## The new variables are numbered from top_id + 1. Returns the clauses and the last variable used.
+def encode_symmetry_breaking_lex(args, nb_updated_extensions, updated_extensions, top_id, DEBUG=False, sink=None):
+    if DEBUG:
+        print("-- Symmetry breaking: lexicographic ordering")
+    clauses = clause_destination(sink)
+    for index in range(len(updated_extensions) - 1):
+        X = updated_extensions[index]
+        Y = updated_extensions[index + 1]
+        equal_prefix = None
+        for argument in args:
+            x_var = membership_SAT_variables(argument, X, args, nb_updated_extensions)
+            y_var = membership_SAT_variables(argument, Y, args, nb_updated_extensions)
+            guard = []
+            if equal_prefix != None:
+                guard = [-equal_prefix]
+            new_clauses = [guard + [x_var, -y_var]]
+            if argument != args[-1]:
+                top_id += 1
+                new_clauses.append(guard + [x_var, y_var, top_id])
+                new_clauses.append(guard + [-x_var, -y_var, top_id])
+                equal_prefix = top_id
+            clauses += new_clauses
+            if DEBUG:
+                print(new_clauses)
+    if DEBUG:
+        print("--")
+    return clauses, top_id
+
+
+### Incremental sweep over the number of extensions (option -ne sweep of main.py)
+## The encoding is built for nb_updated_extensions extensions, with one activation literal act_X per extension.
+## When act_X is false, E_X' is empty and the clauses of its stability block are disabled, so solving under the
+## assumptions act_1,...,act_n,-act_{n+1},...,-act_m amounts to solving the encoding for n extensions.
+
+## Returns the clauses forcing E_X' to be empty when its activation literal is false
+def encode_extension_activation(args, nb_updated_extensions, updated_extensions, activation_literals, DEBUG=False, sink=None):
+    if DEBUG:
+        print("-- Activation of the extensions")
+    clauses = clause_destination(sink)
+    for index in range(len(updated_extensions)):
+        X = updated_extensions[index]
+        for argument in args:
+            new_clause = [activation_literals[index], -membership_SAT_variables(argument, X, args, nb_updated_extensions)]
+            clauses.append(new_clause)
+            if DEBUG:
+                print(new_clause)
+    if DEBUG:
+        print("--")
+    return clauses
+
+## Adds the clauses of block_clauses, which are only required when the activation literal is true
+def encode_guarded_block(block_clauses, activation_literal, sink=None):
+    clauses = clause_destination(sink)
+    for clause in block_clauses:
+        clauses.append([-activation_literal] + list(clause))
+    return clauses
+
+## Returns the assumptions enabling the first nb_active_extensions extensions
+def activation_assumptions(activation_literals, nb_active_extensions):
+    return activation_literals[:nb_active_extensions] + [-literal for literal in activation_literals[nb_active_extensions:]]
+
+
+### Attacks fixed by the constraints (option -c of main.py)
+## fixed_attacks is a dict mapping the pair (attacker, target) to True if the attack must remain,
+## and to False if the non-attack must remain. The encoders below treat the r variables of these pairs as constants:
+## the clauses satisfied by the constant are dropped, the falsified literals are removed, and the def variable of
+## a fixed pair is replaced by the membership variable of the attacker (attack) or removed (non-attack).
+## The unit clauses on the r variables of these pairs are still added by main.py, so that the models keep encoding the whole AF.
+def fixed_attacks_dict(constrained_atts, constrained_non_atts):
+    fixed_attacks = {}
+    for att in constrained_atts:
+        fixed_attacks[(att[0], att[1])] = True
+    for non_att in constrained_non_atts:
+        fixed_attacks[(non_att[0], non_att[1])] = False
+    return fixed_attacks
+
+## Returns the k*k matrix of the fixed attacks: 1 for a fixed attack, -1 for a fixed non-attack and 0 otherwise
+def fixed_attack_matrix(fixed_attacks, args):
+    matrix = np.zeros((len(args), len(args)), dtype=np.int8)
+    for (attacker, target), value in fixed_attacks.items():
+        matrix[args.index(attacker), args.index(target)] = 1 if value else -1
+    return matrix
+
+
 # Clauses from Extension enforcement by Niskanen et al
-def encode_conflict_freeness(args, nb_updated_extensions, updated_extensions, initial_extensions, DEBUG=False):
+def encode_conflict_freeness(args, nb_updated_extensions, updated_extensions, initial_extensions, DEBUG=False, sink=None, fixed_attacks={}):
     ## First part: conflict-freeness
     if DEBUG:
         print("-- Conflict-freeness")
-    clauses = []
+    clauses = clause_destination(sink)
     for extension in updated_extensions:
         for argument_a in args:
             for argument_b in args:
-                clauses.append([-r_SAT_variables(argument_a, argument_b, extension, args, nb_updated_extensions),-membership_SAT_variables(argument_a, extension, args, nb_updated_extensions),-membership_SAT_variables(argument_b, extension, args, nb_updated_extensions)])
+                fixed = fixed_attacks.get((argument_a, argument_b))
+                if fixed == False:
+                    continue
+                # Two fixed attacks between the same arguments give the same clause
+                if fixed and fixed_attacks.get((argument_b, argument_a)) and args.index(argument_b) < args.index(argument_a):
+                    continue
+                new_clause = [-membership_SAT_variables(argument_a, extension, args, nb_updated_extensions),-membership_SAT_variables(argument_b, extension, args, nb_updated_extensions)]
+                if fixed == None:
+                    new_clause.insert(0, -r_SAT_variables(argument_a, argument_b, extension, args, nb_updated_extensions))
+                clauses.append(new_clause)
                 if DEBUG:
-                    print(clauses[-1])
+                    print(new_clause)
     if DEBUG:
         print("--")
     return clauses
 
-def encode_def_variables(args, nb_updated_extensions, updated_extensions, initial_extensions, DEBUG=False):
+## The three clauses defining def_{b,a,E_X'}, i.e. b attacks a and b belongs to E_X'
+def def_variable_clauses(argument_b, argument_a, extension, args, nb_updated_extensions):
+    return [[-defeat_SAT_variables(argument_b, argument_a, extension, args, nb_updated_extensions),membership_SAT_variables(argument_b, extension, args, nb_updated_extensions)],
+            [-defeat_SAT_variables(argument_b, argument_a, extension, args, nb_updated_extensions),r_SAT_variables(argument_b, argument_a, extension, args, nb_updated_extensions)],
+            [-membership_SAT_variables(argument_b, extension, args, nb_updated_extensions),-r_SAT_variables(argument_b, argument_a, extension, args, nb_updated_extensions),defeat_SAT_variables(argument_b, argument_a, extension, args, nb_updated_extensions)]]
+
+## The stability clause of a in E_X': a belongs to E_X' or is defeated by some argument of E_X'
+def stability_clause(argument_a, extension, args, nb_updated_extensions, fixed_attacks={}):
+    new_clause = [membership_SAT_variables(argument_a, extension, args, nb_updated_extensions)]
+    for argument_b in args:
+        fixed = fixed_attacks.get((argument_b, argument_a))
+        if fixed == None:
+            new_clause.append(defeat_SAT_variables(argument_b, argument_a, extension, args, nb_updated_extensions))
+        elif fixed and argument_b != argument_a:
+            new_clause.append(membership_SAT_variables(argument_b, extension, args, nb_updated_extensions))
+    return new_clause
+
+def encode_def_variables(args, nb_updated_extensions, updated_extensions, initial_extensions, DEBUG=False, sink=None, fixed_attacks={}):
     ## Second part: semantics of def-variables
     if DEBUG:
         print("-- def variables")
-    clauses = []
+    clauses = clause_destination(sink)
     for extension in updated_extensions:
         for argument_a in args:
             for argument_b in args:
-                clauses.append([-defeat_SAT_variables(argument_b, argument_a, extension, args, nb_updated_extensions),membership_SAT_variables(argument_b, extension, args, nb_updated_extensions)])
-                clauses.append([-defeat_SAT_variables(argument_b, argument_a, extension, args, nb_updated_extensions),r_SAT_variables(argument_b, argument_a, extension, args, nb_updated_extensions)])
-                clauses.append([-membership_SAT_variables(argument_b, extension, args, nb_updated_extensions),-r_SAT_variables(argument_b, argument_a, extension, args, nb_updated_extensions),defeat_SAT_variables(argument_b, argument_a, extension, args, nb_updated_extensions)])
+                if (argument_b, argument_a) in fixed_attacks:
+                    continue
+                new_clauses = def_variable_clauses(argument_b, argument_a, extension, args, nb_updated_extensions)
+                clauses += new_clauses
                 if DEBUG:
-                    print(clauses[-3:])
+                    print(new_clauses)
     if DEBUG:
         print("--")
     return clauses
 
-def encode_stability(args, nb_updated_extensions, updated_extensions, initial_extensions, DEBUG=False):
+def encode_stability(args, nb_updated_extensions, updated_extensions, initial_extensions, DEBUG=False, sink=None, fixed_attacks={}):
     ## Third part: stability
     if DEBUG:
         print("-- Stability")
-    clauses = []
+    clauses = clause_destination(sink)
     for extension in updated_extensions:
         for argument_a in args:
-            new_clause = [membership_SAT_variables(argument_a, extension, args, nb_updated_extensions)]
-            for argument_b in args:
-                new_clause.append(defeat_SAT_variables(argument_b, argument_a, extension, args, nb_updated_extensions))
+            new_clause = stability_clause(argument_a, extension, args, nb_updated_extensions, fixed_attacks)
             clauses.append(new_clause)
             if DEBUG:
-                print(clauses[-1])
+                print(new_clause)
+    if DEBUG:
+        print("--")
+    return clauses
+
+
+##### Lazy generation of the def variables and stability (option -ls of main.py)
+## The abstraction starts without the clauses of encode_def_variables and encode_stability, so the witness extensions
+## of its models are only conflict-free. After each call to the solver, the pairs (a_i, E_X') such that a_i is neither
+## in E_X' nor attacked by E_X' are collected, and the def and stability clauses of these pairs only are added.
+## When no such pair remains, the witness extensions are stable and the model is a model of the full encoding.
+
+## Returns the pairs (argument, X) such that the argument is neither in E_X' nor attacked by E_X' in the AF encoded in the model
+def find_unstable_pairs(model, args, nb_updated_extensions, updated_extensions):
+    membership = decode_model_membership_matrix(model, args, nb_updated_extensions)
+    attack_matrix = decode_model_as_attack_matrix(model, args, nb_updated_extensions)
+    attacked = (membership.astype(np.int64) @ attack_matrix.astype(np.int64)) > 0
+    unstable = ~membership & ~attacked
+    pairs = []
+    for X in updated_extensions:
+        for i in np.flatnonzero(unstable[X-1]):
+            pairs.append((args[i], X))
+    return pairs
+
+## Returns the def and stability clauses of the given pairs (argument, X), as encode_def_variables and encode_stability
+def encode_stability_pairs(pairs, args, nb_updated_extensions, DEBUG=False, sink=None, fixed_attacks={}):
+    if DEBUG:
+        print("-- Lazy stability")
+    clauses = clause_destination(sink)
+    for argument_a, extension in pairs:
+        for argument_b in args:
+            if (argument_b, argument_a) not in fixed_attacks:
+                clauses += def_variable_clauses(argument_b, argument_a, extension, args, nb_updated_extensions)
+        clauses.append(stability_clause(argument_a, extension, args, nb_updated_extensions, fixed_attacks))
+        if DEBUG:
+            print(clauses[-1])
     if DEBUG:
         print("--")
     return clauses
 
 
+##### Compact alternative to the def variables and stability
+## Instead of k*k*m def variables, there is one variable att_{a_i,E_X'} for each argument and each extension,
+## which is true only if a_i is attacked by some argument of E_X'. Such an attacker is designated by a pointer
+## of L = ceil(log2(k)) bits p_{a_i,E_X',l}, i.e. the value of the pointer is j-1 for the attacker a_j.
+## The variables follow the r variables (there is no def variable in this encoding):
+## att_{a_i,E_X'} -> (m*k + k*k) + (X-1)*k + i
+## p_{a_i,E_X',l} -> (m*k + k*k + m*k) + ((X-1)*k + i-1)*L + l + 1, with 0 <= l < L
+## This gives m*k*(L+1) variables and 2*k*k*m clauses of length L+2 (plus m*k*(L+1) shorter ones),
+## instead of k*k*m variables and 3*k*k*m clauses.
+
+def nb_pointer_bits(args):
+    return max(1, (len(args) - 1).bit_length())
+
+def attacked_SAT_variables(argument, extension, args, nb_updated_extensions):
+    k = len(args)
+    m = nb_updated_extensions
+    i = args.index(argument) + 1
+    X = extension
+    return (k*m) + (k*k) + (X-1)*k + i
+
+def pointer_SAT_variables(argument, extension, bit, args, nb_updated_extensions):
+    k = len(args)
+    m = nb_updated_extensions
+    i = args.index(argument) + 1
+    X = extension
+    return (k*m) + (k*k) + (m*k) + ((X-1)*k + i-1) * nb_pointer_bits(args) + bit + 1
+
+# Last SAT variable used by the compact encoding
+def last_compact_SAT_variable(args, nb_updated_extensions):
+    return pointer_SAT_variables(args[-1], nb_updated_extensions, nb_pointer_bits(args) - 1, args, nb_updated_extensions)
+
+def encode_compact_stability(args, nb_updated_extensions, updated_extensions, initial_extensions, DEBUG=False, sink=None, fixed_attacks={}):
+    if DEBUG:
+        print("-- Compact stability")
+    clauses = clause_destination(sink)
+    nb_bits = nb_pointer_bits(args)
+    # Binary representation of the last pointer value k-1
+    max_value_bits = [((len(args) - 1) >> bit) & 1 for bit in range(nb_bits)]
+    for extension in updated_extensions:
+        for argument_a in args:
+            att_var = attacked_SAT_variables(argument_a, extension, args, nb_updated_extensions)
+            pointer_vars = [pointer_SAT_variables(argument_a, extension, bit, args, nb_updated_extensions) for bit in range(nb_bits)]
+            new_clauses = [[membership_SAT_variables(argument_a, extension, args, nb_updated_extensions), att_var]]
+            # The pointer is at most k-1: it cannot have a 1 where k-1 has a 0 and the same bits as k-1 above it
+            for bit in range(nb_bits):
+                if max_value_bits[bit] == 0:
+                    new_clauses.append([-pointer_vars[bit]] + [-pointer_vars[higher] for higher in range(bit+1, nb_bits) if max_value_bits[higher] == 1])
+            # If a_i is attacked in E_X' and the pointer designates a_j, then a_j belongs to E_X' and attacks a_i
+            for j in range(len(args)):
+                argument_b = args[j]
+                pointer_differs = [pointer_vars[bit] if (j >> bit) & 1 == 0 else -pointer_vars[bit] for bit in range(nb_bits)]
+                fixed = fixed_attacks.get((argument_b, argument_a))
+                if fixed == False:
+                    new_clauses.append([-att_var] + pointer_differs)
+                    continue
+                new_clauses.append([-att_var] + pointer_differs + [membership_SAT_variables(argument_b, extension, args, nb_updated_extensions)])
+                if fixed == None:
+                    new_clauses.append([-att_var] + pointer_differs + [r_SAT_variables(argument_b, argument_a, extension, args, nb_updated_extensions)])
+            clauses += new_clauses
+            if DEBUG:
+                print(new_clauses)
+    if DEBUG:
+        print("--")
+    return clauses
+
+
+##### Vectorized version of the three previous encodings (conflict-freeness, def variables and stability)
+## The clauses are computed with NumPy as integer arrays (one clause per row) from grids of indices,
+## the i-th argument (starting at 1) being args[i-1]. They produce exactly the same set of clauses as
+## the functions above. The arrays can be given to a solver in bulk after a call to tolist().
+## With a matrix of fixed attacks (see fixed_attack_matrix), the clauses satisfied by the fixed pairs are removed as well,
+## but the rows keep the same length: a falsified or replaced literal becomes a copy of another literal of the clause.
+
+def membership_SAT_variables_array(i, X, k, nb_updated_extensions):
+    return (i-1) * nb_updated_extensions + X
+
+def r_SAT_variables_array(i, j, k, nb_updated_extensions):
+    m = nb_updated_extensions
+    return (m * k) + (i-1)*k + j
+
+def defeat_SAT_variables_array(i, j, X, k, nb_updated_extensions):
+    m = nb_updated_extensions
+    return (k*m) + (k*k) + (X-1)*k*k + (i-1)*k + j
+
+# Returns the grids X, I, J (flattened) for X in updated_extensions and I, J in 1..k
+def extension_argument_argument_grids(updated_extensions, k):
+    grids = np.meshgrid(np.asarray(updated_extensions, dtype=np.int64), np.arange(1, k+1, dtype=np.int64), np.arange(1, k+1, dtype=np.int64), indexing='ij')
+    return [grid.ravel() for grid in grids]
+
+def encode_conflict_freeness_array(args, nb_updated_extensions, updated_extensions, fixed_matrix=None):
+    k = len(args)
+    X, A, B = extension_argument_argument_grids(updated_extensions, k)
+    r_literals = -r_SAT_variables_array(A, B, k, nb_updated_extensions)
+    membership_a_literals = -membership_SAT_variables_array(A, X, k, nb_updated_extensions)
+    if fixed_matrix is not None:
+        fixed = fixed_matrix[A-1, B-1]
+        r_literals = np.where(fixed == 1, membership_a_literals, r_literals)
+        kept = (fixed != -1) & ~((fixed == 1) & (fixed_matrix[B-1, A-1] == 1) & (B < A))
+        X, A, B, r_literals, membership_a_literals = X[kept], A[kept], B[kept], r_literals[kept], membership_a_literals[kept]
+    return np.stack([r_literals, membership_a_literals, -membership_SAT_variables_array(B, X, k, nb_updated_extensions)], axis=1)
+
+## Returns the arrays of the binary clauses (first two kinds of clauses) and of the ternary clauses (third kind)
+def encode_def_variables_array(args, nb_updated_extensions, updated_extensions, fixed_matrix=None):
+    k = len(args)
+    X, A, B = extension_argument_argument_grids(updated_extensions, k)
+    if fixed_matrix is not None:
+        kept = fixed_matrix[B-1, A-1] == 0
+        X, A, B = X[kept], A[kept], B[kept]
+    def_vars = defeat_SAT_variables_array(B, A, X, k, nb_updated_extensions)
+    membership_vars = membership_SAT_variables_array(B, X, k, nb_updated_extensions)
+    r_vars = r_SAT_variables_array(B, A, k, nb_updated_extensions)
+    binary_clauses = np.concatenate([np.stack([-def_vars, membership_vars], axis=1), np.stack([-def_vars, r_vars], axis=1)])
+    ternary_clauses = np.stack([-membership_vars, -r_vars, def_vars], axis=1)
+    return binary_clauses, ternary_clauses
+
+def encode_stability_array(args, nb_updated_extensions, updated_extensions, fixed_matrix=None):
+    k = len(args)
+    X, A = np.meshgrid(np.asarray(updated_extensions, dtype=np.int64), np.arange(1, k+1, dtype=np.int64), indexing='ij')
+    X = X.ravel()[:, None]
+    A = A.ravel()[:, None]
+    B = np.arange(1, k+1, dtype=np.int64)[None, :]
+    membership_literals = membership_SAT_variables_array(A, X, k, nb_updated_extensions)
+    def_literals = defeat_SAT_variables_array(B, A, X, k, nb_updated_extensions)
+    if fixed_matrix is not None:
+        fixed = fixed_matrix[B-1, A-1]
+        def_literals = np.where(fixed == 1, membership_SAT_variables_array(B, X, k, nb_updated_extensions), def_literals)
+        def_literals = np.where(fixed == -1, membership_literals, def_literals)
+    return np.concatenate([membership_literals, def_literals], axis=1)
+
 ### Minimal change of the graph: soft clauses (all with weight=1) corresponding to the attack relation of the initial AF
-def encode_graph_minimal_change(args, atts, nb_updated_extensions, DEBUG=False):
+### There is no soft clause for the pairs in fixed_attacks, see fixed_change_cost for their cost
+def encode_graph_minimal_change(args, atts, nb_updated_extensions, DEBUG=False, fixed_attacks={}):
     # r_SAT_variables(attacker, target, extension, args, nb_updated_extensions)
+    att_set = set((att[0], att[1]) for att in atts)
     clauses = []
     if DEBUG:
         print("-- Soft clauses --")
     for attacker in args:
         for target in args:
-            if [attacker, target] in atts:
+            if (attacker, target) in fixed_attacks:
+                continue
+            if (attacker, target) in att_set:
                 clauses.append([r_SAT_variables(attacker, target, 1, args, nb_updated_extensions)])
             else:
                 clauses.append([-r_SAT_variables(attacker, target, 1, args, nb_updated_extensions)])
@@ -182,68 +565,224 @@ def encode_graph_minimal_change(args, atts, nb_updated_extensions, DEBUG=False):
         print("-- End soft clauses--")
     return clauses
 
+## Number of changes to the initial attack relation which are forced by fixed_attacks
+def fixed_change_cost(atts, fixed_attacks):
+    att_set = set((att[0], att[1]) for att in atts)
+    return len([pair for pair, value in fixed_attacks.items() if (pair in att_set) != value])
+
 ##### Decoding
+## The model is turned once into a boolean array of the values of the variables (see decode_model_values),
+## from which the attack matrix and the witness extensions are extracted with array operations.
+
 ## Returns a apx-string corresponding to the AF encoded in the model
 def decode_model_as_af(model,args,nb_updated_extensions):
-    result = ""
-    for argument in args:
-        result += f"arg({argument}).\n"
-    for attacker in args:
-        for target in args:
-            if r_SAT_variables(attacker, target, 1, args, nb_updated_extensions) in model:
-                result += f"att({attacker},{target}).\n"
-    return result
+    attack_matrix = decode_model_as_attack_matrix(model, args, nb_updated_extensions)
+    lines = [f"arg({argument}).\n" for argument in args]
+    for i, j in zip(*np.nonzero(attack_matrix)):
+        lines.append(f"att({args[i]},{args[j]}).\n")
+    return "".join(lines)
 
 ## Returns a list of args and list of atts corresponding to the AF encoded in the model
 def decode_model_as_af_struct(model,args,nb_updated_extensions):
-    atts = []
+    attack_matrix = decode_model_as_attack_matrix(model, args, nb_updated_extensions)
+    atts = [[args[i], args[j]] for i, j in zip(*np.nonzero(attack_matrix))]
+    return args, atts
+
+
+## Returns a boolean array values such that values[v] is True iff the SAT variable v is true in the model
+def decode_model_values(model, nb_vars):
+    values = np.zeros(nb_vars + 1, dtype=bool)
+    literals = np.asarray(model, dtype=int)
+    values[literals[(literals > 0) & (literals <= nb_vars)]] = True
+    return values
+
+## Returns the attack matrix of the AF encoded in the model, i.e. a boolean k*k array
+## such that attack_matrix[i][j] is True iff args[i] attacks args[j]
+def decode_model_as_attack_matrix(model, args, nb_updated_extensions):
+    k = len(args)
+    first_r_var = r_SAT_variables(args[0], args[0], 1, args, nb_updated_extensions)
+    values = decode_model_values(model, first_r_var + k*k - 1)
+    return values[first_r_var:first_r_var + k*k].reshape(k, k)
+
+## Returns the membership matrix of the witness extensions encoded in the model, i.e. a boolean m*k array
+## such that membership[X-1][i] is True iff args[i] belongs to E_X'
+def decode_model_membership_matrix(model, args, nb_updated_extensions):
+    k = len(args)
+    m = nb_updated_extensions
+    values = decode_model_values(model, m*k)
+    return values[1:m*k + 1].reshape(k, m).T
+
+## Returns the list of the witness extensions encoded in the model, i.e. for each extension index X in updated_extensions,
+## the list of the arguments which belong to E_X'
+def decode_model_witness_extensions(model, args, nb_updated_extensions, updated_extensions):
+    membership = decode_model_membership_matrix(model, args, nb_updated_extensions)
+    extensions = []
+    for X in updated_extensions:
+        extensions.append([args[i] for i in np.flatnonzero(membership[X-1])])
+    return extensions
+
+## Returns the attack matrix of the AF (args,atts), as decode_model_as_attack_matrix
+def attack_matrix_of_af(args, atts):
+    attack_matrix = np.zeros((len(args), len(args)), dtype=bool)
+    for att in atts:
+        attack_matrix[args.index(att[0]), args.index(att[1])] = True
+    return attack_matrix
+
+## Returns the number of attacks added to or removed from the initial attack relation, given by its attack matrix,
+## in the AF encoded in the model (Hamming distance between the attack matrices)
+def decode_model_change_cost(model, args, nb_updated_extensions, initial_attack_matrix):
+    attack_matrix = decode_model_as_attack_matrix(model, args, nb_updated_extensions)
+    return int(np.count_nonzero(attack_matrix != initial_attack_matrix))
+
+
+##### Refinement
+## Returns a clause forbidding the attack relation of the AF encoded in the model
+## (whatever the values of the membership and def variables)
+def forbid_af(model, args, nb_updated_extensions):
+    model_literals = set(model)
+    clause = []
     for attacker in args:
         for target in args:
-            if r_SAT_variables(attacker, target, 1, args, nb_updated_extensions) in model:
-                atts.append([attacker,target])
-    return args, atts
+            r_var = r_SAT_variables(attacker, target, 1, args, nb_updated_extensions)
+            if r_var in model_literals:
+                clause.append(-r_var)
+            else:
+                clause.append(r_var)
+    return clause
 
+## Returns a clause forbidding every AF in which the given extension of the AF encoded in the model
+## remains a stable extension, i.e. either the extension becomes conflicting, or some attack
+## from the extension towards an argument outside the extension is removed
+def forbid_stable_extension(model, args, nb_updated_extensions, extension):
+    model_literals = set(model)
+    clause = []
+    for attacker in extension:
+        for target in args:
+            r_var = r_SAT_variables(attacker, target, 1, args, nb_updated_extensions)
+            if target in extension:
+                clause.append(r_var)
+            elif r_var in model_literals:
+                clause.append(-r_var)
+    return clause
 
-#### Returns True iff the current model is a counter-example, i.e. some arguments in the negative target are credulously accepted
-def check_counterexample_negative_target(model, args, neg_target, nb_updated_extensions,semantics):
-    args, atts = decode_model_as_af_struct(model,args,nb_updated_extensions)
-    for neg_arg in neg_target:
-        if solvers.credulous_acceptability(args,atts,neg_arg,semantics):
-            return True
-    return False
-
-#### Returns True iff the current model is a counter-example for the conjunctive positive targets,
-#### i.e. some set of arguments should appear together in an extension but its not the case
-def check_counterexample_conjunctive_positive(model, args, conjunctive_positive, nb_updated_extensions, semantics):
-    args, atts = decode_model_as_af_struct(model,args,nb_updated_extensions)
-    for conjunct in conjunctive_positive:
-        if not solvers.credulous_acceptability_set(args,atts,conjunct,semantics):
-            return True
-    return False
 
-nb_check = 0
+#### Returns some extension of the AF encoded in the reasoner (see solvers.Reasoner) which violates one of the negative
+#### constraints, i.e. which contains an argument of neg_target, or all the arguments of some set in conjunctive_negative,
+#### or an argument of forbidden_args. A single SAT call is made: each constraint has a selector literal (the argument
+#### itself for single arguments) and at least one selector must be true. This clause is enabled by a new selector
+#### variable, which is disabled once the query is answered, so the reasoner can be used for other queries.
+#### Returns a pair (extension, violations), where violations is the list of the violated constraints, described as
+#### pairs ("neg_target", [argument]), ("neg_conjunct", conjunct) or ("strict", [argument]), or (None, []) if there is no such extension.
+def find_violating_extension(reasoner, neg_target, conjunctive_negative, forbidden_args):
+    if len(neg_target) == len(conjunctive_negative) == len(forbidden_args) == 0:
+        return None, []
 
-#### Returns True iff the current model is a counter-example for the conjunctive negative targets,
-#### i.e. some set of arguments should not appear together in an extension but they do
-def check_counterexample_conjunctive_negative(model, args, conjunctive_negative, nb_updated_extensions, semantics):
-    global nb_check
-    nb_check += 1
-    args, atts = decode_model_as_af_struct(model,args,nb_updated_extensions)
+    selectors = []
+    for argname in neg_target:
+        selectors.append(reasoner.index.sat_var(argname))
+    for argname in forbidden_args:
+        selectors.append(reasoner.index.sat_var(argname))
+    conjunct_selectors = []
     for conjunct in conjunctive_negative:
-        if solvers.credulous_acceptability_set(args,atts,conjunct,semantics):
-            return True
-    return False
-
-#### Returns True iff the current model is a counter-example for the strict enforcement,
-#### i.e. some argument which was not initially (credulously) accepted, and does not belong to the target,
-#### is accepted in the updated theory.
-def check_counterexample_strict_version(model, args, target, nb_updated_extensions, initial_extensions, semantics):
-    args, atts = decode_model_as_af_struct(model,args,nb_updated_extensions)
+        reasoner.top_var += 1
+        conjunct_selectors.append(reasoner.top_var)
+        for argname in conjunct:
+            reasoner.solver.add_clause([-reasoner.top_var, reasoner.index.sat_var(argname)])
+    reasoner.top_var += 1
+    query_selector = reasoner.top_var
+    reasoner.solver.add_clause([-query_selector] + selectors + conjunct_selectors)
+    model = reasoner.solve([query_selector])
+    reasoner.solver.add_clause([-query_selector])
+
+    extension = None
+    violations = []
+    if model != None:
+        extension = solvers.argset_from_model(model, reasoner.args)
+        for argname in neg_target:
+            if argname in extension:
+                violations.append(("neg_target", [argname]))
+        for i in range(len(conjunctive_negative)):
+            if model[conjunct_selectors[i] - 1] > 0:
+                violations.append(("neg_conjunct", conjunctive_negative[i]))
+        for argname in forbidden_args:
+            if argname in extension:
+                violations.append(("strict", [argname]))
+    return extension, violations
+
+
+#### Returns the arguments which must not be accepted for the strict enforcement, i.e. the arguments
+#### which are not in the target and were not initially credulously accepted
+def strict_forbidden_arguments(args, target, initial_extensions):
+    forbidden_args = []
     for argument in args:
         if (argument not in target) and (not is_credulously_accepted(argument, initial_extensions)):
-            if solvers.credulous_acceptability(args,atts,argument,semantics):
-                return True
-    return False
+            forbidden_args.append(argument)
+    return forbidden_args
+
+#### Returns True iff all the arguments in conjunct belong to extension
+def contains_all(extension, conjunct):
+    for argname in conjunct:
+        if argname not in extension:
+            return False
+    return True
+
+#### Returns the first violation of a negative constraint (see find_violating_extension) by one of the extensions,
+#### and this extension, or (None, None) if all the extensions satisfy the negative constraints
+def find_violation_in_extensions(extensions, neg_target, conjunctive_negative, forbidden_args):
+    for extension in extensions:
+        for argname in neg_target:
+            if argname in extension:
+                return ("neg_target", [argname]), extension
+        for conjunct in conjunctive_negative:
+            if contains_all(extension, conjunct):
+                return ("neg_conjunct", conjunct), extension
+        for argname in forbidden_args:
+            if argname in extension:
+                return ("strict", [argname]), extension
+    return None, None
+
+#### Returns a pair (violation, extension) for the AF encoded in the model, where violation is None if the AF satisfies
+#### the query (and the strict enforcement if strict is True), and otherwise describes one violated constraint as a pair
+#### (kind, arguments) with kind in "neg_target", "pos_conjunct", "neg_conjunct" and "strict".
+#### extension is an extension of the AF which witnesses the violation, or None when the violation is the lack of
+#### an extension, i.e. some set of arguments in conjunctive_positive is not accepted together.
+#### The witness extensions encoded in the model are stable extensions of the AF, as well as the known_extensions,
+#### so they are used first: the SAT solver is only called for the constraints that they do not decide.
+def find_counterexample(model, args, target, neg_target, conjunctive_positive, conjunctive_negative, nb_updated_extensions, updated_extensions, initial_extensions, semantics, strict, known_extensions=[]):
+    witnesses = decode_model_witness_extensions(model, args, nb_updated_extensions, updated_extensions) + known_extensions
+    args, atts = decode_model_as_af_struct(model,args,nb_updated_extensions)
+
+    forbidden_args = []
+    if strict:
+        forbidden_args = strict_forbidden_arguments(args, target, initial_extensions)
+
+    violation, extension = find_violation_in_extensions(witnesses, neg_target, conjunctive_negative, forbidden_args)
+    if violation != None:
+        return violation, extension
+
+    uncovered_conjuncts = []
+    for conjunct in conjunctive_positive:
+        covered = False
+        for witness in witnesses:
+            if contains_all(witness, conjunct):
+                covered = True
+                break
+        if not covered:
+            uncovered_conjuncts.append(conjunct)
+    if len(uncovered_conjuncts) == len(neg_target) == len(conjunctive_negative) == len(forbidden_args) == 0:
+        return None, None
 
-def check_counterexample(model, args, neg_target, conjunctive_positive, conjunctive_negative, nb_updated_extensions, semantics):
-    return check_counterexample_negative_target(model, args, neg_target, nb_updated_extensions,semantics) or check_counterexample_conjunctive_positive(model, args, conjunctive_positive, nb_updated_extensions, semantics) or check_counterexample_conjunctive_negative(model, args, conjunctive_negative, nb_updated_extensions, semantics)
+    # The AF is encoded once for all the remaining checks: the uncovered conjuncts are checked under assumptions,
+    # and the negative constraints with a selector
+    reasoner = solvers.Reasoner(args, atts, semantics)
+    violation, extension = None, None
+    for conjunct in uncovered_conjuncts:
+        if not reasoner.credulous_acceptability_set(conjunct):
+            violation = ("pos_conjunct", conjunct)
+            break
+    if violation == None:
+        extension, violations = find_violating_extension(reasoner, neg_target, conjunctive_negative, forbidden_args)
+        if extension != None:
+            violation = violations[0]
+    reasoner.delete()
+    return violation, extension
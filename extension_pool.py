@@ -0,0 +1,59 @@
+import numpy as np
+
+### Bounded pool of the extensions found during a run of the CEGAR loop
+### Consecutive candidate AFs often differ by a few attacks only, so an extension found for some candidate
+### is frequently still a stable extension of the next ones.
+### The extensions are stored as the rows of a boolean matrix (one column per argument in args).
+### When the pool is full, the extension which has been stable in a candidate AF least recently is evicted.
+class ExtensionPool():
+
+    def __init__(self, args, max_size):
+        self.args = args
+        self.arg_index = { args[i] : i for i in range(len(args)) }
+        self.max_size = max_size
+        self.extensions = np.zeros((0, len(args)), dtype=bool)
+        self.last_use = np.zeros(0, dtype=int)
+        self.clock = 0
+
+    def __len__(self):
+        return self.extensions.shape[0]
+
+    # Adds an extension (list of argument names) to the pool, unless it is already there
+    def add(self, extension):
+        if self.max_size <= 0:
+            return
+        self.clock += 1
+        row = np.zeros(len(self.args), dtype=bool)
+        for argname in extension:
+            row[self.arg_index[argname]] = True
+
+        same_rows = np.flatnonzero((self.extensions == row).all(axis=1))
+        if len(same_rows) > 0:
+            self.last_use[same_rows[0]] = self.clock
+            return
+
+        if len(self) < self.max_size:
+            self.extensions = np.vstack([self.extensions, row])
+            self.last_use = np.append(self.last_use, self.clock)
+        else:
+            evicted = np.argmin(self.last_use)
+            self.extensions[evicted] = row
+            self.last_use[evicted] = self.clock
+
+    # Returns the extensions of the pool (lists of argument names) which are stable extensions of the AF
+    # given by its attack matrix, i.e. attack_matrix[i][j] is True iff args[i] attacks args[j]
+    def stable_extensions(self, attack_matrix):
+        if len(self) == 0:
+            return []
+        self.clock += 1
+        # attacked[e][j] is True iff args[j] is attacked by some member of the e-th extension
+        attacked = self.extensions @ attack_matrix
+        conflict_free = ~((attacked & self.extensions).any(axis=1))
+        attacks_outsiders = (attacked | self.extensions).all(axis=1)
+        stable_rows = np.flatnonzero(conflict_free & attacks_outsiders)
+
+        self.last_use[stable_rows] = self.clock
+        result = []
+        for row in stable_rows:
+            result.append([self.args[i] for i in np.flatnonzero(self.extensions[row])])
+        return result
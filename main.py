@@ -4,12 +4,15 @@ import time
 
 import pygarg.solvers as solvers
 
-from pysat.solvers import Solver
-from pysat.examples.fm import FM
-from pysat.formula import WCNF
 from pysat.card import *
 
 import credulous_encoding
+import cegar
+import clause_sink
+import af_output
+import simplification
+import extension_pool
+import verdict_cache
 import util
 
 import argparse
@@ -17,6 +20,13 @@ import argparse
 semantics_list = ["ST"]
 problems_list = ["CEnfS", "CEnfNS", "OptCEnfS", "OptCEnfNS"]
 formats_list = ["apx"]
+maxsat_list = ["rc2", "fm"]
+refinements_list = ["strong", "af", "model"]
+symmetry_breaking_list = ["none", "pin", "lex"]
+encoders_list = ["python", "numpy"]
+streams_list = ["none", "solver", "buffer"]
+initial_extensions_list = ["all", "cover"]
+defeat_encodings_list = ["full", "compact"]
 
 argparser = argparse.ArgumentParser()
 argparser.add_argument("af_file",help="the file containing the initial AF")
@@ -25,9 +35,25 @@ argparser.add_argument("-v", "--verbose", help="increase output verbosity", acti
 argparser.add_argument("-p", "--problem", help=f"the pair XX-YY with XX in {problems_list} and YY in {semantics_list}")
 argparser.add_argument("-fo", "--format", help=f"the format of the AF file in {formats_list} (default: apx)", default="apx")
 argparser.add_argument("-o", "--output", help="the output file for printing the new theory (the standard output is used if this option is not set)")
-argparser.add_argument("-ne", "--nextensions", help="the expected number of extensions for the updated AF (default: the number of extensions of the initial AF)")
+argparser.add_argument("-om", "--output-mode", help=f"the output of the new theory in {af_output.output_modes_list}: full prints the whole AF, diff only prints the added (+att(a,b).) and removed (-att(a,b).) attacks, see apply_patch.py (default: full)", default="full")
+argparser.add_argument("-ne", "--nextensions", help="the expected number of extensions for the updated AF, or auto for a small number of extensions chosen by a greedy heuristic covering the arguments which must be accepted (this is not guaranteed to be enough: the answer may be UNSAT, or the cost not optimal, although more extensions would give a (better) solution; the chosen number and the size of the encoding are printed on the standard error), or sweep for the smallest number of extensions (at most the default one) for which the enforcement succeeds, only for the decision problems (default: the number of extensions of the initial AF)")
 argparser.add_argument("-c", "--constraints", help="the constraints file indicating which (non-)attacks from the initial theory should remain")
 argparser.add_argument("-bo", "--bounded", help="the threshold for bounded enforcement")
+argparser.add_argument("-rf", "--refinement", help=f"the refinement clauses added to the abstraction for each counterexample in {refinements_list} (default: strong)", default="strong")
+argparser.add_argument("-enc", "--encoder", help=f"the implementation of the conflict-freeness, def variables and stability clauses in {encoders_list} (default: python)", default="python")
+argparser.add_argument("-de", "--defeat-encoding", help=f"the encoding of stability in {defeat_encodings_list}: full uses one def variable per attacker, target and extension, compact uses one variable per argument and extension with a binary pointer to its attacker (default: full)", default="full")
+argparser.add_argument("-ls", "--lazy-stability", help="generate the def variables and stability clauses lazily, only for the arguments and witness extensions violating stability in some model (only with -de full)", action="store_true")
+argparser.add_argument("-ec", "--eager-conjuncts", help="encode the positive conjunctive targets, i.e. require that each of them is included in some witness extension (this may cut off solutions when the number of extensions is small, by default they are only checked on the candidate AFs)", action="store_true")
+argparser.add_argument("-sb", "--symmetry-breaking", help=f"the symmetry breaking constraints over the witness extensions in {symmetry_breaking_list} (default: none)", default="none")
+argparser.add_argument("-ps", "--pool-size", help="the maximal number of extensions kept in the pool used for finding counterexamples without SAT calls, 0 for disabling the pool (default: 100)", default="100")
+argparser.add_argument("-cs", "--cache-size", help="the maximal number of verdicts of counterexample checks kept in the cache, 0 for disabling the cache (default: 10000)", default="10000")
+argparser.add_argument("-cf", "--cache-file", help="the file used for loading and saving the cache of verdicts, so that it is shared between several runs on the same instance")
+argparser.add_argument("-st", "--stream", help=f"the destination of the clauses while encoding in {streams_list}: none builds a list of clauses, solver sends each clause to the solver, buffer packs the clauses into a flat array of literals (default: none)", default="none")
+argparser.add_argument("-sp", "--simplify", help="simplify the formula before solving it (unit propagation, duplicate removal and subsumption), not available with -st solver", action="store_true")
+argparser.add_argument("-em", "--enumeration-method", help=f"the enumeration of the extensions of the initial AF in {solvers.enumeration_methods_list}: sat enumerates the models of the whole encoding, scc solves the strongly connected components in topological order (default: sat)", default="sat")
+argparser.add_argument("-ie", "--initial-extensions", help=f"the extensions of the initial AF used by the encoding in {initial_extensions_list}: all enumerates all of them, cover only computes extensions covering the credulously accepted arguments, and counts the extensions up to the cap given by -ic (default: all)", default="all")
+argparser.add_argument("-ic", "--initial-cap", help="the maximal number of extensions of the initial AF which are counted with -ie cover (default: 16)", default="16")
+argparser.add_argument("-ms", "--maxsat", help=f"the MaxSAT solver used for the optimization problems in {maxsat_list} (default: rc2)", default="rc2")
 cli_args = argparser.parse_args()
 
 if cli_args.problem == None:
@@ -46,11 +72,61 @@ if problem not in problems_list:
 if semantics not in semantics_list:
     sys.exit(f"Semantics {semantics} not recognized. Supported problems: {semantics_list}.")
 
+if cli_args.refinement not in refinements_list:
+    sys.exit(f"Refinement {cli_args.refinement} not recognized. Supported refinements: {refinements_list}.")
+
+if cli_args.encoder not in encoders_list:
+    sys.exit(f"Encoder {cli_args.encoder} not recognized. Supported encoders: {encoders_list}.")
+
+if cli_args.defeat_encoding not in defeat_encodings_list:
+    sys.exit(f"Defeat encoding {cli_args.defeat_encoding} not recognized. Supported defeat encodings: {defeat_encodings_list}.")
+
+if cli_args.lazy_stability and cli_args.defeat_encoding != "full":
+    sys.exit("The lazy generation of the stability clauses (-ls) is only available with -de full.")
+
+if cli_args.symmetry_breaking not in symmetry_breaking_list:
+    sys.exit(f"Symmetry breaking {cli_args.symmetry_breaking} not recognized. Supported symmetry breaking: {symmetry_breaking_list}.")
+
+if cli_args.maxsat not in maxsat_list:
+    sys.exit(f"MaxSAT solver {cli_args.maxsat} not recognized. Supported MaxSAT solvers: {maxsat_list}.")
+
+if cli_args.output_mode not in af_output.output_modes_list:
+    sys.exit(f"Output mode {cli_args.output_mode} not recognized. Supported output modes: {af_output.output_modes_list}.")
+
+if cli_args.enumeration_method not in solvers.enumeration_methods_list:
+    sys.exit(f"Enumeration method {cli_args.enumeration_method} not recognized. Supported enumeration methods: {solvers.enumeration_methods_list}.")
+
+if cli_args.initial_extensions not in initial_extensions_list:
+    sys.exit(f"Initial extensions {cli_args.initial_extensions} not recognized. Supported initial extensions: {initial_extensions_list}.")
+
+if cli_args.stream not in streams_list:
+    sys.exit(f"Stream {cli_args.stream} not recognized. Supported streams: {streams_list}.")
+
+if cli_args.simplify and cli_args.stream == "solver":
+    sys.exit("The simplification of the formula (-sp) needs the whole formula, it cannot be used with -st solver.")
+
+def strict_problem(problem):
+    return problem in ["CEnfS", "OptCEnfS"] 
+
+def decision_problem(problem):
+    return problem in ["CEnfS", "CEnfNS"]
+
+def optimization_problem(problem):
+    return problem in ["OptCEnfS", "OptCEnfNS"]
+
 args, atts = parser.parse(apx_file)
+args = util.ArgumentList(args)
 nb_args = len(args)
 
+### The initial extensions are only used for deciding whether arguments are credulously accepted (and for choosing m with -ne auto),
+### so with -ie cover they are replaced by extensions covering the credulously accepted arguments, and their number is capped
 time_start_enumeration = time.time()
-initial_extensions = solvers.extension_enumeration(args,atts,semantics)
+if cli_args.initial_extensions == "cover":
+    initial_extensions = solvers.covering_extensions(args,atts,semantics)
+    nb_initial_extensions = solvers.extension_counting(args,atts,semantics,cap=int(cli_args.initial_cap),method=cli_args.enumeration_method)
+else:
+    initial_extensions = solvers.extension_enumeration(args,atts,semantics,method=cli_args.enumeration_method)
+    nb_initial_extensions = len(initial_extensions)
 enumeration_time = time.time() - time_start_enumeration
 
 DEBUG = False
@@ -75,13 +151,26 @@ for conjunct_neg in conjunctive_negative:
 conjunctive_size += tmp
 
 # m
-if conjunctive_size > len(initial_extensions):
+if conjunctive_size > nb_initial_extensions:
     nb_updated_extensions = conjunctive_size
 else:
-    nb_updated_extensions = len(initial_extensions)
+    nb_updated_extensions = nb_initial_extensions
 #nb_updated_extensions = len(initial_extensions)
-    
-if cli_args.nextensions != None:
+
+### Arguments which must belong to some extension of the updated AF
+required_args = list(target)
+for argument in args:
+    if (argument not in neg_target) and util.is_credulously_accepted(argument, initial_extensions):
+        required_args.append(argument)
+
+if cli_args.nextensions == "auto":
+    nb_updated_extensions = credulous_encoding.greedy_nb_extensions(required_args, conjunctive_positive, conjunctive_negative, initial_extensions)
+    # Printed on the standard error, so that it is not mixed with the AF
+    print(f"nb_updated_extensions = {nb_updated_extensions}", file=sys.stderr)
+elif cli_args.nextensions == "sweep":
+    if not decision_problem(problem):
+        sys.exit("The sweep over the number of extensions (-ne sweep) is only available for the decision problems.")
+elif cli_args.nextensions != None:
     nb_updated_extensions = int(cli_args.nextensions)
 updated_extensions = [x+1 for x in range(nb_updated_extensions)]
 
@@ -112,53 +201,141 @@ if cli_args.verbose:
     print(f"conjunctive_positive = {conjunctive_positive}")
     print(f"conjunctive_negative = {conjunctive_negative}")
 
-clauses = credulous_encoding.encode_target(target,args, nb_updated_extensions, updated_extensions, DEBUG)
-clauses += credulous_encoding.encode_negative_target(neg_target,args, nb_updated_extensions, updated_extensions, DEBUG)
-clauses += credulous_encoding.remaining_credulously_accepted_arguments(args, neg_target, nb_updated_extensions, updated_extensions, initial_extensions, DEBUG)
-clauses += credulous_encoding.encode_conflict_freeness(args, nb_updated_extensions, updated_extensions, initial_extensions, DEBUG)
-clauses += credulous_encoding.encode_def_variables(args, nb_updated_extensions, updated_extensions, initial_extensions, DEBUG)
-clauses += credulous_encoding.encode_stability(args, nb_updated_extensions, updated_extensions, initial_extensions, DEBUG)
-clauses += credulous_encoding.encode_no_self_attacks(args,atts,1, nb_updated_extensions)
-
-
+### Attacks and non-attacks fixed by the constraints: their r variables are treated as constants by the encoders
+fixed_attacks = {}
+fixed_matrix = None
 if cli_args.constraints != None:
     constraints_file = cli_args.constraints
     constrained_atts, constrained_non_atts = util.parse_constraints_file(constraints_file)
+    fixed_attacks = credulous_encoding.fixed_attacks_dict(constrained_atts, constrained_non_atts)
+    fixed_matrix = credulous_encoding.fixed_attack_matrix(fixed_attacks, args)
+
+### Simplifier of the formula (see simplification.py), if -sp is used
+simplifier = None
+
+### Returns the engine used for solving the abstraction, built from the given (hard) clauses
+def new_engine(clauses):
+    if decision_problem(problem):
+        engine = cegar.SATEngine(clauses)
+    elif optimization_problem(problem):
+        soft_clauses = credulous_encoding.encode_graph_minimal_change(args, atts, nb_updated_extensions, DEBUG, fixed_attacks)
+        if simplifier != None:
+            soft_clauses = simplifier.simplify_soft_clauses(soft_clauses)
+        if cli_args.maxsat == "rc2":
+            engine = cegar.RC2Engine(clauses, soft_clauses)
+        else:
+            engine = cegar.FMEngine(clauses, soft_clauses)
+    else:
+        sys.exit(f"Unsupported problem: {problem}")
+    if simplifier != None:
+        return simplification.SimplifyingEngine(engine, simplifier)
+    return engine
+
+### The encoders add their clauses to a list, or to a streaming destination (see clause_sink.py)
+if cli_args.stream == "solver":
+    engine = new_engine([])
+    clauses = clause_sink.EngineSink(engine)
+elif cli_args.stream == "buffer":
+    clauses = clause_sink.ClauseBuffer()
+else:
+    clauses = []
+
+credulous_encoding.encode_target(target,args, nb_updated_extensions, updated_extensions, DEBUG, clauses)
+credulous_encoding.encode_negative_target(neg_target,args, nb_updated_extensions, updated_extensions, DEBUG, clauses)
+credulous_encoding.remaining_credulously_accepted_arguments(args, neg_target, nb_updated_extensions, updated_extensions, initial_extensions, DEBUG, clauses)
+if cli_args.encoder == "numpy":
+    clause_sink.extend_with_array(clauses, credulous_encoding.encode_conflict_freeness_array(args, nb_updated_extensions, updated_extensions, fixed_matrix))
+else:
+    credulous_encoding.encode_conflict_freeness(args, nb_updated_extensions, updated_extensions, initial_extensions, DEBUG, clauses, fixed_attacks)
+
+### Encodes the def variables (or the variables of the compact encoding) and the stability of the given extensions
+def encode_stability_blocks(extensions, sink):
+    if cli_args.defeat_encoding == "compact":
+        credulous_encoding.encode_compact_stability(args, nb_updated_extensions, extensions, initial_extensions, DEBUG, sink, fixed_attacks)
+    elif cli_args.encoder == "numpy":
+        for def_clauses in credulous_encoding.encode_def_variables_array(args, nb_updated_extensions, extensions, fixed_matrix):
+            clause_sink.extend_with_array(sink, def_clauses)
+        clause_sink.extend_with_array(sink, credulous_encoding.encode_stability_array(args, nb_updated_extensions, extensions, fixed_matrix))
+    else:
+        credulous_encoding.encode_def_variables(args, nb_updated_extensions, extensions, initial_extensions, DEBUG, sink, fixed_attacks)
+        credulous_encoding.encode_stability(args, nb_updated_extensions, extensions, initial_extensions, DEBUG, sink, fixed_attacks)
+    return sink
+
+# The def variables and stability clauses are added during the CEGAR loop with -ls,
+# and after the activation literals are numbered with -ne sweep
+if not cli_args.lazy_stability and cli_args.nextensions != "sweep":
+    encode_stability_blocks(updated_extensions, clauses)
+credulous_encoding.encode_no_self_attacks(args,atts,1, nb_updated_extensions, clauses, fixed_attacks)
+
+
+if cli_args.constraints != None:
     for att in constrained_atts:
         clauses.append([credulous_encoding.r_SAT_variables(att[0], att[1], 1, args, nb_updated_extensions)])
     for non_att in constrained_non_atts:
         clauses.append([-credulous_encoding.r_SAT_variables(non_att[0], non_att[1], 1, args, nb_updated_extensions)])
 
+# Last SAT variable used by the encoding, new variables are numbered from last_SAT_var + 1
+if cli_args.defeat_encoding == "compact":
+    last_SAT_var = credulous_encoding.last_compact_SAT_variable(args, nb_updated_extensions)
+else:
+    last_SAT_var = credulous_encoding.defeat_SAT_variables(args[-1], args[-1], nb_updated_extensions, args, nb_updated_extensions)
+
+if cli_args.eager_conjuncts:
+    last_SAT_var = credulous_encoding.encode_positive_conjuncts(conjunctive_positive, args, nb_updated_extensions, updated_extensions, last_SAT_var, DEBUG, clauses)[1]
+
+if cli_args.symmetry_breaking == "pin":
+    credulous_encoding.encode_symmetry_breaking_pin(required_args, args, nb_updated_extensions, updated_extensions, DEBUG, clauses)
+elif cli_args.symmetry_breaking == "lex":
+    last_SAT_var = credulous_encoding.encode_symmetry_breaking_lex(args, nb_updated_extensions, updated_extensions, last_SAT_var, DEBUG, clauses)[1]
+
 
 if cli_args.bounded != None:
     #print(f"bound = {cli_args.bounded}")
     bound_threshold = float(cli_args.bounded)
     bound_value = int(bound_threshold * len(args) * len(args))
+    att_set = set((att[0], att[1]) for att in atts)
     card_literals = []
     for attacker in args:
-        for target in args:
-            if [attacker,target] in atts:
-                card_literals.append(-credulous_encoding.r_SAT_variables(attacker, target, 1, args, nb_updated_extensions))
+        for attacked in args:
+            if (attacker,attacked) in att_set:
+                card_literals.append(-credulous_encoding.r_SAT_variables(attacker, attacked, 1, args, nb_updated_extensions))
             else:
-                card_literals.append(credulous_encoding.r_SAT_variables(attacker, target, 1, args, nb_updated_extensions))
-    last_SAT_var = credulous_encoding.defeat_SAT_variables(args[-1], args[-1], nb_updated_extensions, args, nb_updated_extensions)
+                card_literals.append(credulous_encoding.r_SAT_variables(attacker, attacked, 1, args, nb_updated_extensions))
     card_constraint = CardEnc.atmost(card_literals,bound=bound_value,top_id=last_SAT_var)
     #print(f"last_SAT_var = {last_SAT_var}")
     #print(f"card_constraint.clauses = {card_constraint.clauses}")
     clauses += card_constraint.clauses
-
-
-def strict_problem(problem):
-    return problem in ["CEnfS", "OptCEnfS"] 
-
-def decision_problem(problem):
-    return problem in ["CEnfS", "CEnfNS"]
-
-def optimization_problem(problem):
-    return problem in ["OptCEnfS", "OptCEnfNS"]
+    last_SAT_var = max(last_SAT_var, card_constraint.nv)
 
 if strict_problem(problem) :
-    clauses += credulous_encoding.strict_version(target, args, nb_updated_extensions, updated_extensions, initial_extensions, DEBUG)
+    credulous_encoding.strict_version(target, args, nb_updated_extensions, updated_extensions, initial_extensions, DEBUG, clauses)
+
+### With -ne sweep, the extensions are enabled one by one by activation literals (see credulous_encoding.py)
+activation_literals = []
+if cli_args.nextensions == "sweep":
+    activation_literals = [last_SAT_var + X for X in updated_extensions]
+    last_SAT_var += nb_updated_extensions
+    credulous_encoding.encode_extension_activation(args, nb_updated_extensions, updated_extensions, activation_literals, DEBUG, clauses)
+    if not cli_args.lazy_stability:
+        for index in range(nb_updated_extensions):
+            credulous_encoding.encode_guarded_block(encode_stability_blocks([updated_extensions[index]], []), activation_literals[index], clauses)
+
+if cli_args.verbose:
+    print(f"nb_SAT_variables = {last_SAT_var}")
+    print(f"nb_clauses = {len(clauses)}")
+elif cli_args.nextensions == "auto":
+    print(f"nb_SAT_variables = {last_SAT_var}", file=sys.stderr)
+    print(f"nb_clauses = {len(clauses)}", file=sys.stderr)
+if cli_args.verbose and cli_args.stream != "none":
+    print(f"saved_memory = {clauses.saved_memory()}")
+
+if cli_args.simplify:
+    simplifier = simplification.Simplifier(clauses, last_SAT_var)
+    clauses = simplifier.clauses
+    if cli_args.verbose:
+        print(f"nb_simplified_clauses = {len(clauses)}")
+        print(f"nb_fixed_variables = {len(simplifier.fixed)}")
+        print(f"simplification_time = {simplifier.simplification_time}")
 
 time_start_enforcement = time.time()
 model = None
@@ -168,72 +345,126 @@ SAT_result = "UNSAT"
 
 
 ### Returns the clause corresponding to the negation of a model
+### With the compact defeat encoding, the attacked and pointer variables are not determined by the
+### membership and r variables, so only the part of the model over these variables is negated
 def forbid_model(model):
     clause = []
     for literal in model:
-        clause.append(-literal)
+        if cli_args.defeat_encoding == "full" or abs(literal) <= nb_updated_extensions * len(args) + len(args) * len(args):
+            clause.append(-literal)
     return clause
 
-solution_cost = None
+### Returns the clause added to the abstraction when the model is a counterexample,
+### extension being the extension of the AF which witnesses the violation (if any)
+def refinement_clause(model, extension):
+    if cli_args.refinement == "model":
+        return forbid_model(model)
+    if cli_args.refinement == "strong" and extension != None:
+        return credulous_encoding.forbid_stable_extension(model, args, nb_updated_extensions, extension)
+    return credulous_encoding.forbid_af(model, args, nb_updated_extensions)
 
+solution_cost = None
 
-if decision_problem(problem):
-    s = Solver(name='g4')
-    for clause in clauses:
-        s.add_clause(clause)
-
-    model = None
-    if s.solve():
-        SAT_result = "SAT"
-        model = s.get_model()
 
-    s.delete()
+if cli_args.stream != "solver":
+    engine = new_engine(clauses)
+
+pool = extension_pool.ExtensionPool(args, int(cli_args.pool_size))
+nb_pool_counterexamples = 0
+
+cache = verdict_cache.VerdictCache(int(cli_args.cache_size), cli_args.cache_file)
+# Fingerprints of the query without (False) and with (True) the constraints of the strict enforcement
+query_keys = {}
+query_keys[False] = verdict_cache.query_fingerprint(args, neg_target, conjunctive_positive, conjunctive_negative, [])
+query_keys[True] = verdict_cache.query_fingerprint(args, neg_target, conjunctive_positive, conjunctive_negative, credulous_encoding.strict_forbidden_arguments(args, target, initial_extensions))
+
+### Returns the cached verdict (found, violation, extension) for the AF with the given fingerprint.
+### A violation of the query without the strict constraints is also a violation with them,
+### and an AF satisfying the query with the strict constraints also satisfies it without them.
+def lookup_verdict(af_key):
+    strict = strict_problem(problem)
+    return cache.lookup(af_key + query_keys[strict], af_key + query_keys[not strict], lambda violation: (violation != None) == strict)
+
+### Number of extensions enabled by the activation literals with -ne sweep
+nb_active_extensions = nb_updated_extensions
+if cli_args.nextensions == "sweep":
+    nb_active_extensions = 1
+
+### Returns a model of the abstraction, or None if it is unsatisfiable. With -ne sweep, the number of enabled
+### extensions is increased until the abstraction is satisfiable (the learned clauses are kept by the solver).
+### The extensions are only enabled, never disabled: the refinement clauses do not depend on the number of extensions.
+def solve_abstraction():
+    global nb_active_extensions
+    if cli_args.nextensions != "sweep":
+        return engine.solve()
+    model = engine.solve(credulous_encoding.activation_assumptions(activation_literals, nb_active_extensions))
+    while model == None and nb_active_extensions < nb_updated_extensions:
+        nb_active_extensions += 1
+        if cli_args.verbose:
+            print(f"nb_active_extensions = {nb_active_extensions}")
+        model = engine.solve(credulous_encoding.activation_assumptions(activation_literals, nb_active_extensions))
+    return model
+
+nb_violations = {}
+nb_lazy_pairs = 0
+nb_lazy_clauses = 0
+model = solve_abstraction()
+while model != None:
+    active_extensions = updated_extensions[:nb_active_extensions]
+    if cli_args.lazy_stability:
+        # The witness extensions must be stable before the model is checked
+        unstable_pairs = credulous_encoding.find_unstable_pairs(model, args, nb_updated_extensions, active_extensions)
+        if len(unstable_pairs) > 0:
+            nb_lazy_pairs += len(unstable_pairs)
+            lazy_clauses = credulous_encoding.encode_stability_pairs(unstable_pairs, args, nb_updated_extensions, DEBUG, None, fixed_attacks)
+            nb_lazy_clauses += len(lazy_clauses)
+            for clause in lazy_clauses:
+                engine.add_clause(clause)
+            model = solve_abstraction()
+            continue
+    attack_matrix = credulous_encoding.decode_model_as_attack_matrix(model, args, nb_updated_extensions)
+    af_key = verdict_cache.af_fingerprint(attack_matrix)
+    pool_extensions = []
+    found, violation, extension = lookup_verdict(af_key)
+    if not found:
+        pool_extensions = pool.stable_extensions(attack_matrix)
+        violation, extension = credulous_encoding.find_counterexample(model, args, target, neg_target, conjunctive_positive, conjunctive_negative, nb_updated_extensions, active_extensions, initial_extensions, semantics, strict_problem(problem), pool_extensions)
+        cache.store(af_key + query_keys[strict_problem(problem)], violation, extension)
+        for witness in credulous_encoding.decode_model_witness_extensions(model, args, nb_updated_extensions, active_extensions):
+            pool.add(witness)
+    if violation == None:
+        break
+    nb_violations[violation[0]] = nb_violations.get(violation[0], 0) + 1
+    if extension != None:
+        for pool_extension in pool_extensions:
+            if extension is pool_extension:
+                nb_pool_counterexamples += 1
+        pool.add(extension)
+    engine.add_clause(refinement_clause(model, extension))
+    model = solve_abstraction()
 
-    while model != None and (credulous_encoding.check_counterexample(model, args, neg_target, conjunctive_positive, conjunctive_negative, nb_updated_extensions, semantics) or (strict_problem(problem) and credulous_encoding.check_counterexample_strict_version(model, args, target, nb_updated_extensions, initial_extensions, semantics))):
-        s = Solver(name='g4')
-        clauses.append(forbid_model(model))
-        for clause in clauses:
-            s.add_clause(clause)
+if model != None:
+    SAT_result = "SAT"
+    if cli_args.verbose and cli_args.nextensions == "sweep":
+        print(f"nb_updated_extensions = {nb_active_extensions}")
+    if optimization_problem(problem):
+        # The changes forced by the constraints have no soft clause
+        solution_cost = engine.cost + credulous_encoding.fixed_change_cost(atts, fixed_attacks)
 
-        if s.solve():
-            SAT_result = "SAT"
-            model = s.get_model()
-        else:
-            model = None
-        s.delete()
-        
-elif optimization_problem(problem):
-    wcnf = WCNF()
-    for clause in clauses:
-        wcnf.append(clause)
-        
-    soft_clauses = credulous_encoding.encode_graph_minimal_change(args, atts, nb_updated_extensions, DEBUG)
-    for soft_clause in soft_clauses:
-        wcnf.append(soft_clause, weight=1)
-
-    nb_models = 0
-    s = FM(wcnf, verbose = 0)
-    if s.compute():
-        SAT_result = "SAT"
-        model = s.model
-        nb_models+=1
-        solution_cost = s.cost
-    s.delete()
-    while model != None and (credulous_encoding.check_counterexample(model, args, neg_target, conjunctive_positive, conjunctive_negative, nb_updated_extensions, semantics) or (strict_problem(problem) and credulous_encoding.check_counterexample_strict_version(model, args, target, nb_updated_extensions, initial_extensions, semantics))):
-        nb_models+=1
-        wcnf.append(forbid_model(model))
-        s = FM(wcnf, verbose = 0)
-        SAT_result = "UNSAT"
-        solution_cost = None
-        if s.compute():
-            SAT_result = "SAT"
-            model = s.model
-            solution_cost = s.cost
-        else:
-            model = None
-        s.delete()
-else:
-    sys.exit(f"Unsupported problem: {problem}")
+if cli_args.verbose:
+    cegar.print_statistics(engine)
+    print(f"nb_violations = {nb_violations}")
+    if cli_args.lazy_stability:
+        print(f"nb_lazy_stability_pairs = {nb_lazy_pairs}")
+        print(f"nb_lazy_stability_clauses = {nb_lazy_clauses}")
+    print(f"nb_pool_counterexamples = {nb_pool_counterexamples}")
+    print(f"nb_cache_hits = {cache.nb_hits}")
+    print(f"nb_cache_misses = {cache.nb_misses}")
+    print(f"peak_memory = {clause_sink.peak_memory()}")
+engine.delete()
+
+if cli_args.cache_file != None:
+    cache.save(cli_args.cache_file)
 
 if model == None:
     solution_cost = None
@@ -243,21 +474,17 @@ enforcement_time = time.time() - time_start_enforcement
 if model != None:
     if DEBUG:
         print(model)
-    if cli_args.output == None:
-        print(credulous_encoding.decode_model_as_af(model,args,nb_updated_extensions))
+    updated_attack_matrix = credulous_encoding.decode_model_as_attack_matrix(model, args, nb_updated_extensions)
+    initial_attack_matrix = credulous_encoding.attack_matrix_of_af(args, atts)
+    writer = af_output.open_output(cli_args.output)
+    if cli_args.output_mode == "diff":
+        af_output.write_af_diff(writer, args, updated_attack_matrix, initial_attack_matrix)
     else:
-        with open(cli_args.output, 'w') as output_file:
-            print(credulous_encoding.decode_model_as_af(model,args,nb_updated_extensions), file = output_file)
+        af_output.write_af(writer, args, updated_attack_matrix)
+    af_output.close_output(writer)
 
     if solution_cost == None:
-        solution_cost = 0
-        updated_args, updated_atts = credulous_encoding.decode_model_as_af_struct(model,args,nb_updated_extensions)
-        for att in atts:
-            if att not in updated_atts:
-                solution_cost += 1
-        for att in updated_atts:
-            if att not in atts:
-                solution_cost += 1
+        solution_cost = credulous_encoding.decode_model_change_cost(model, args, nb_updated_extensions, initial_attack_matrix)
 
 
 #print(f"{SAT_result} - Enumeration Time = {enumeration_time} - Enforcement Time = {enforcement_time} - Total Time = {enumeration_time+enforcement_time} - Solution cost = {solution_cost}")
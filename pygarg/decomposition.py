@@ -0,0 +1,236 @@
+import time
+
+from pysat.solvers import Solver
+import pygarg.encoding as encoding
+
+### SCC-recursive computation of the stable extensions
+## The strongly connected components (SCCs) of the attack graph are solved in topological order (attackers first).
+## The arguments of a component attacked by an accepted argument of the upstream components are rejected, and the other
+## ones are labelled by the stable extensions of the component restricted to them: conflict-free sets attacking each of
+## them which they do not contain. Small components are solved by trying all the subsets, larger ones with a SAT solver.
+## The weakly connected parts of the graph are independent, so the number of extensions is the product of their numbers
+## of extensions. Within a part, the labellings of the upstream components are merged when they accept the same attackers
+## of the remaining components, so they are counted without being expanded.
+## The extensions are given as bitsets, as in pygarg.solvers (the i-th bit is set iff args[i] is in the extension).
+
+
+# Returns the SCCs of the attack graph as lists of positions in args, in topological order (an SCC comes after the
+# SCCs of the arguments attacking it). Tarjan's algorithm, without recursion.
+def strongly_connected_components(index):
+    n = len(index.args)
+    successors = [[] for i in range(n)]
+    for attacker, target in index.attack_set:
+        successors[attacker].append(target)
+
+    order = [None] * n
+    lowlink = [0] * n
+    on_stack = [False] * n
+    stack = []
+    components = []
+    counter = 0
+    for root in range(n):
+        if order[root] != None:
+            continue
+        work = [(root, 0)]
+        while len(work) > 0:
+            node, position = work.pop()
+            if position == 0:
+                order[node] = counter
+                lowlink[node] = counter
+                counter += 1
+                stack.append(node)
+                on_stack[node] = True
+            recurse = False
+            for next_position in range(position, len(successors[node])):
+                successor = successors[node][next_position]
+                if order[successor] == None:
+                    work.append((node, next_position + 1))
+                    work.append((successor, 0))
+                    recurse = True
+                    break
+                if on_stack[successor]:
+                    lowlink[node] = min(lowlink[node], order[successor])
+            if recurse:
+                continue
+            if lowlink[node] == order[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    component.append(member)
+                    if member == node:
+                        break
+                components.append(sorted(component))
+            if len(work) > 0:
+                parent = work[-1][0]
+                lowlink[parent] = min(lowlink[parent], lowlink[node])
+    # Tarjan's algorithm finds the SCCs in reverse topological order
+    components.reverse()
+    return components
+
+# Returns the weakly connected parts of the graph, as lists of SCCs (in topological order)
+def weakly_connected_parts(components, index):
+    component_of = {}
+    for c in range(len(components)):
+        for member in components[c]:
+            component_of[member] = c
+    parent = list(range(len(components)))
+    def find(c):
+        while parent[c] != c:
+            parent[c] = parent[parent[c]]
+            c = parent[c]
+        return c
+    for attacker, target in index.attack_set:
+        parent[find(component_of[attacker])] = find(component_of[target])
+    parts = {}
+    for c in range(len(components)):
+        parts.setdefault(find(c), []).append(components[c])
+    return list(parts.values())
+
+
+### Stable extensions of an AF computed SCC by SCC
+## nb_sat_components -> the number of components (with their upstream labellings) solved with the SAT solver
+class SCCSolver():
+
+    def __init__(self, args, atts, sat_threshold=12):
+        self.index = encoding.AFIndex(args, atts)
+        self.sat_threshold = sat_threshold
+        # attacker_masks[i] is the bitset of the attackers of args[i]
+        self.attacker_masks = [0] * len(args)
+        for attacker, target in self.index.attack_set:
+            self.attacker_masks[target] |= 1 << attacker
+        self.components = strongly_connected_components(self.index)
+        self.parts = weakly_connected_parts(self.components, self.index)
+        self.nb_sat_components = 0
+
+    # Returns the bitsets of the labellings of the component, i.e. its sets of accepted arguments,
+    # given the bitset of the accepted arguments of the upstream components
+    def component_extensions(self, component, upstream):
+        candidates = [i for i in component if self.attacker_masks[i] & upstream == 0]
+        if len(candidates) <= self.sat_threshold:
+            return self.component_extensions_brute_force(candidates)
+        return self.component_extensions_sat(candidates)
+
+    def component_extensions_brute_force(self, candidates):
+        extensions = []
+        for choice in range(1 << len(candidates)):
+            accepted = 0
+            for position in range(len(candidates)):
+                if (choice >> position) & 1:
+                    accepted |= 1 << candidates[position]
+            valid = True
+            for i in candidates:
+                attacked = self.attacker_masks[i] & accepted != 0
+                if attacked == ((accepted >> i) & 1 == 1):
+                    valid = False
+                    break
+            if valid:
+                extensions.append(accepted)
+        return extensions
+
+    def component_extensions_sat(self, candidates):
+        self.nb_sat_components += 1
+        variables = { candidates[position] : position + 1 for position in range(len(candidates)) }
+        s = Solver(name='g4')
+        for i in candidates:
+            attackers = [attacker for attacker in self.index.attackers[i] if attacker in variables]
+            for attacker in attackers:
+                s.add_clause([-variables[attacker], -variables[i]])
+            s.add_clause([variables[i]] + [variables[attacker] for attacker in attackers])
+        extensions = []
+        while s.solve():
+            model = s.get_model()
+            accepted = 0
+            for i in candidates:
+                if model[variables[i] - 1] > 0:
+                    accepted |= 1 << i
+            extensions.append(accepted)
+            s.add_clause([-variables[i] if (accepted >> i) & 1 else variables[i] for i in candidates])
+        s.delete()
+        return extensions
+
+    # Yields the stable extensions of a weakly connected part (depth-first over its components, without recursion)
+    # Nothing more is yielded once the deadline (a time.time() value) is passed
+    def iter_part(self, part, deadline=None):
+        stack = [(0, 0, None)]
+        while len(stack) > 0:
+            if deadline != None and time.time() > deadline:
+                return
+            c, upstream, choices = stack.pop()
+            if c == len(part):
+                yield upstream
+                continue
+            if choices == None:
+                choices = iter(self.component_extensions(part[c], upstream))
+            accepted = next(choices, None)
+            if accepted != None:
+                stack.append((c, upstream, choices))
+                stack.append((c + 1, upstream | accepted, None))
+
+    # Yields the stable extensions of the AF, as the combinations of the extensions of the parts. The first part is
+    # iterated once with a generator; the extensions of the other parts are cached as the combinations reach them,
+    # so that only the extensions needed by the combinations yielded so far are computed.
+    def iter_extensions(self, deadline=None):
+        if len(self.parts) == 0:
+            yield 0
+            return
+        others = self.parts[1:]
+        generators = [self.iter_part(part, deadline) for part in others]
+        cached = [[] for part in others]
+
+        # Returns the extension of others[p] at the given position, or None if the part has fewer extensions
+        def cached_extension(p, position):
+            while len(cached[p]) <= position and generators[p] != None:
+                accepted = next(generators[p], None)
+                if accepted == None:
+                    generators[p] = None
+                else:
+                    cached[p].append(accepted)
+            if position < len(cached[p]):
+                return cached[p][position]
+            return None
+
+        for first in self.iter_part(self.parts[0], deadline):
+            stack = [(0, first, 0)]
+            while len(stack) > 0:
+                if deadline != None and time.time() > deadline:
+                    return
+                p, bitset, position = stack.pop()
+                if p == len(others):
+                    yield bitset
+                    continue
+                accepted = cached_extension(p, position)
+                if accepted != None:
+                    stack.append((p, bitset, position + 1))
+                    stack.append((p + 1, bitset | accepted, 0))
+                elif position == 0:
+                    # A part without extension: the AF has no extension
+                    return
+
+    # Returns the number of stable extensions of a weakly connected part. The components are processed in order,
+    # the upstream labellings being merged when they agree on the arguments attacking the next components.
+    def count_part(self, part):
+        # frontiers[c] is the bitset of the attackers of the arguments of the components from c on
+        frontiers = [0] * (len(part) + 1)
+        for c in range(len(part) - 1, -1, -1):
+            frontiers[c] = frontiers[c + 1]
+            for i in part[c]:
+                frontiers[c] |= self.attacker_masks[i]
+        counts = { 0 : 1 }
+        for c in range(len(part)):
+            next_counts = {}
+            for upstream, nb_labellings in counts.items():
+                for accepted in self.component_extensions(part[c], upstream):
+                    key = (upstream | accepted) & frontiers[c + 1]
+                    next_counts[key] = next_counts.get(key, 0) + nb_labellings
+            counts = next_counts
+        return sum(counts.values())
+
+    # Returns the number of stable extensions of the AF, without enumerating them
+    def count_extensions(self):
+        result = 1
+        for part in self.parts:
+            result *= self.count_part(part)
+            if result == 0:
+                break
+        return result
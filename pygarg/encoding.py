@@ -11,11 +11,57 @@ import sys
 ## P(args[i]) -> n + (i+1)
 
 
+### Index of an AF, built once per AF and shared by the encoders below
+## ids[argname] -> position i of the argument in args, i.e. its SAT variable is i+1
+## attackers[i] -> positions of the attackers of args[i], in the order of atts
+## attack_set -> set of the pairs of positions (i, j) such that args[i] attacks args[j]
+class AFIndex():
+
+    def __init__(self, args, atts):
+        self.args = args
+        self.ids = {}
+        for i in range(len(args)):
+            if args[i] not in self.ids:
+                self.ids[args[i]] = i
+        self.attackers = [[] for i in range(len(args))]
+        self.attack_set = set()
+        for attack in atts:
+            attacker = self.ids.get(attack[0])
+            target = self.ids.get(attack[1])
+            if attacker != None and target != None:
+                self.attackers[target].append(attacker)
+                self.attack_set.add((attacker, target))
+
+    def sat_var(self, argname):
+        if argname in self.ids:
+            return self.ids[argname] + 1
+        sys.exit(f"Unknown argument name: ({argname})")
+
+    def sat_var_Pa(self, argname):
+        if argname in self.ids:
+            return self.ids[argname] + 1 + len(self.args)
+        sys.exit(f"Unkown argument name: ({argname})")
+
+# Returns the index of the AF, or the given one
+def af_index(args, atts, index=None):
+    if index == None:
+        return AFIndex(args, atts)
+    return index
+
+
 # Determines whether arg is attacked by a member of
 # set_of_args w.r.t. the attack relation atts
-def attacked_by(arg,set_of_args,atts):
+# Callers asking several queries about the same AF should pass its index (built once), the attack
+# relation is scanned otherwise
+def attacked_by(arg,set_of_args,atts,index=None):
+    if index == None:
+        for possible_attacker in set_of_args:
+            if [possible_attacker, arg] in atts:
+                return True
+        return False
+    target = index.ids.get(arg)
     for possible_attacker in set_of_args:
-        if [possible_attacker, arg] in atts:
+        if (index.ids.get(possible_attacker), target) in index.attack_set:
             return True
     return False
 
@@ -35,81 +81,89 @@ def sat_var_Pa_from_arg_name(argname, args):
         sys.exit(f"Unkown argument name: ({argname})")
 
 # Returns the set of attackers of an argument
-def get_attackers(argument, args, atts):
-    attackers = []
-    for attack in atts:
-        if (attack[1] == argument) and (attack[0] in args):
-            attackers.append(attack[0])
-    return attackers
+def get_attackers(argument, args, atts, index=None):
+    index = af_index(args, atts, index)
+    position = index.ids.get(argument)
+    if position == None:
+        return []
+    return [args[attacker] for attacker in index.attackers[position]]
 
 
 
 ##### Encodes conflict-freeness
-def conflict_free(args, atts):
+def conflict_free(args, atts, index=None):
+    index = af_index(args, atts, index)
     clauses = []
     n_vars = len(args)
     for attack in atts:
         attacker = attack[0]
         target = attack[1]
-        new_clause = [-sat_var_from_arg_name(attacker, args), -sat_var_from_arg_name(target, args)]
+        new_clause = [-index.sat_var(attacker), -index.sat_var(target)]
         clauses.append(new_clause)
             
     return n_vars, clauses
 
 
 ##### Encodes stable semantics
-def stable(args, atts):
-    n_vars, clauses = conflict_free(args, atts)
-    for argument in args:
-        new_clause = [sat_var_from_arg_name(argument,args)]
-        for attacker in get_attackers(argument, args, atts):
-            new_clause.append(sat_var_from_arg_name(attacker, args))
+def stable(args, atts, index=None):
+    index = af_index(args, atts, index)
+    n_vars, clauses = conflict_free(args, atts, index)
+    for i in range(len(args)):
+        new_clause = [i + 1]
+        for attacker in index.attackers[i]:
+            new_clause.append(attacker + 1)
         clauses.append(new_clause)
     return n_vars, clauses
 
 #### Encodes defense
-def pa_vars(args,atts):
+## The variable P(args[i]) is n + (i+1)
+def pa_vars(args, atts, index=None):
+    index = af_index(args, atts, index)
     clauses = []
     n_vars = len(args)
-    for argument in args:
-        long_clause = [-sat_var_Pa_from_arg_name(argument, args)]
-        for attacker in get_attackers(argument, args, atts):
-            new_clause = [sat_var_Pa_from_arg_name(argument, args), -sat_var_from_arg_name(attacker, args)]
+    for i in range(len(args)):
+        long_clause = [-(n_vars + i + 1)]
+        for attacker in index.attackers[i]:
+            new_clause = [n_vars + i + 1, -(attacker + 1)]
             clauses.append(new_clause)
-            long_clause.append(sat_var_from_arg_name(attacker, args))
+            long_clause.append(attacker + 1)
         clauses.append(long_clause)
     return n_vars, clauses
 
-def defense(args, atts):
-    n_vars, clauses = pa_vars(args, atts)
-    for argument in args:
-        for attacker in get_attackers(argument, args, atts):
-            new_clause = [sat_var_Pa_from_arg_name(attacker, args), -sat_var_from_arg_name(argument, args)]
+def defense(args, atts, index=None):
+    index = af_index(args, atts, index)
+    n_vars, clauses = pa_vars(args, atts, index)
+    for i in range(len(args)):
+        for attacker in index.attackers[i]:
+            new_clause = [n_vars + attacker + 1, -(i + 1)]
             clauses.append(new_clause)
     return n_vars, clauses
     
 
 ### Encodes admissibility
-def admissibility(args, atts):
-    n_vars, cf_clauses = conflict_free(args, atts)
-    def_clauses = defense(args, atts)[1]
+def admissibility(args, atts, index=None):
+    index = af_index(args, atts, index)
+    n_vars, cf_clauses = conflict_free(args, atts, index)
+    def_clauses = defense(args, atts, index)[1]
     return n_vars, cf_clauses + def_clauses
 
 ### Encodes complete semantics
-def complete_defense(args, atts):
-    n_vars, clauses = pa_vars(args, atts)
-    for argument in args:
-        long_clause = [sat_var_from_arg_name(argument,args)]
-        for attacker in get_attackers(argument, args, atts):
-            new_clause = [sat_var_Pa_from_arg_name(attacker, args), -sat_var_from_arg_name(argument, args)]
+def complete_defense(args, atts, index=None):
+    index = af_index(args, atts, index)
+    n_vars, clauses = pa_vars(args, atts, index)
+    for i in range(len(args)):
+        long_clause = [i + 1]
+        for attacker in index.attackers[i]:
+            new_clause = [n_vars + attacker + 1, -(i + 1)]
             clauses.append(new_clause)
-            long_clause.append(-sat_var_Pa_from_arg_name(attacker, args))
+            long_clause.append(-(n_vars + attacker + 1))
         clauses.append(long_clause)
     return n_vars, clauses
 
-def complete(args, atts):
-    n_vars, cf_clauses = conflict_free(args, atts)
-    def_clauses = complete_defense(args, atts)[1]
+def complete(args, atts, index=None):
+    index = af_index(args, atts, index)
+    n_vars, cf_clauses = conflict_free(args, atts, index)
+    def_clauses = complete_defense(args, atts, index)[1]
     return n_vars, cf_clauses + def_clauses
 
 
@@ -1,5 +1,11 @@
+import itertools
+import sys
+import threading
+import time
+
 from pysat.solvers import Solver
 import pygarg.encoding as encoding
+import pygarg.decomposition as decomposition
 
 def argset_from_model(model,args):
     extension = []
@@ -17,112 +23,210 @@ def negate_model(model):
         negation_clause.append(-literal)
     return negation_clause
 
-def get_encoding(args, atts, semantics):
+def get_encoding(args, atts, semantics, index=None):
     if semantics == "CF":
-        return encoding.conflict_free(args, atts)
+        return encoding.conflict_free(args, atts, index)
     if semantics == "AD":
-        return encoding.admissibility(args, atts)
+        return encoding.admissibility(args, atts, index)
     if semantics == "ST":
-        return encoding.stable(args, atts)
+        return encoding.stable(args, atts, index)
     if semantics == "CO":
-        return encoding.complete(args, atts)
+        return encoding.complete(args, atts, index)
     sys.exit(f"Unknown semantics : {semantics}")
 
-def credulous_acceptability(args,atts,argname,semantics):
-    n_vars, clauses = get_encoding(args, atts,semantics)
-    arg_var = encoding.sat_var_from_arg_name(argname, args)
 
-    s = Solver(name='g4')
-    for clause in clauses:
-        s.add_clause(clause)
-        
-    s.add_clause([arg_var])
-    
-    if s.solve():
-        s.delete()
-        return True
-    s.delete()
-    return False
-
-def credulous_acceptability_set(args,atts,conjunct,semantics):
-    n_vars, clauses = get_encoding(args, atts,semantics)
+### Incremental reasoner for an AF and a semantics
+### The AF is encoded once in a SAT solver which is kept alive, and each query is answered
+### by a call to the solver under assumptions, so the clauses learned for a query are kept for the next ones.
+### It keeps track of:
+## nb_calls -> the number of calls to the solver
+## encoding_time -> the time spent encoding the AF and loading the clauses into the solver
+## solving_time -> the time spent in the solver
+class Reasoner():
+
+    def __init__(self, args, atts, semantics, solver_name='g4'):
+        self.args = args
+        self.nb_calls = 0
+        self.encoding_time = 0
+        self.solving_time = 0
+
+        time_start = time.time()
+        self.index = encoding.AFIndex(args, atts)
+        n_vars, clauses = get_encoding(args, atts, semantics, self.index)
+        # Variables used by the encoding (the P variables of AD and CO follow the argument variables),
+        # new variables are numbered from top_var + 1
+        self.top_var = max([2 * n_vars] + [abs(literal) for clause in clauses for literal in clause])
+        self.solver = Solver(name=solver_name)
+        self.solver.append_formula(clauses)
+        self.encoding_time += time.time() - time_start
+
+    # Returns a model of the encoding under the assumptions, or None if there is none
+    def solve(self, assumptions=[]):
+        self.nb_calls += 1
+        time_start = time.time()
+        result = self.solver.solve(assumptions=assumptions)
+        self.solving_time += time.time() - time_start
+        if result:
+            return self.solver.get_model()
+        return None
+
+    def credulous_acceptability(self, argname):
+        return self.solve([self.index.sat_var(argname)]) != None
+
+    def credulous_acceptability_set(self, conjunct):
+        return self.solve([self.index.sat_var(argname) for argname in conjunct]) != None
+
+    def skeptical_acceptability(self, argname):
+        return self.solve([-self.index.sat_var(argname)]) == None
+
+    # Some argument of the conjunct must be rejected: this clause is enabled by a new selector variable,
+    # which is disabled once the query is answered
+    def skeptical_acceptability_set(self, conjunct):
+        self.top_var += 1
+        selector = self.top_var
+        self.solver.add_clause([-selector] + [-self.index.sat_var(argname) for argname in conjunct])
+        result = self.solve([selector]) == None
+        self.solver.add_clause([-selector])
+        return result
+
+    # Returns extensions such that each credulously accepted argument belongs to one of them. Each call to the solver
+    # requires some argument which is not covered yet, so there are at most as many calls as accepted arguments.
+    def covering_extensions(self):
+        extensions = []
+        uncovered = list(self.args)
+        while len(uncovered) > 0:
+            self.top_var += 1
+            selector = self.top_var
+            self.solver.add_clause([-selector] + [self.index.sat_var(argname) for argname in uncovered])
+            model = self.solve([selector])
+            self.solver.add_clause([-selector])
+            if model == None:
+                break
+            extension = argset_from_model(model, self.args)
+            extensions.append(extension)
+            uncovered = [argname for argname in uncovered if argname not in extension]
+        return extensions
+
+    def compute_some_extension(self):
+        model = self.solve()
+        if model != None:
+            return argset_from_model(model, self.args)
+        return "NO"
+
+    def delete(self):
+        self.solver.delete()
 
-    s = Solver(name='g4')
-    for clause in clauses:
-        s.add_clause(clause)
 
-    for argname in conjunct:
-        s.add_clause([encoding.sat_var_from_arg_name(argname, args)])
+def credulous_acceptability(args,atts,argname,semantics):
+    reasoner = Reasoner(args, atts, semantics)
+    result = reasoner.credulous_acceptability(argname)
+    reasoner.delete()
+    return result
 
-    if s.solve():
-        s.delete()
-        return True
-    s.delete()
-    return False
+def credulous_acceptability_set(args,atts,conjunct,semantics):
+    reasoner = Reasoner(args, atts, semantics)
+    result = reasoner.credulous_acceptability_set(conjunct)
+    reasoner.delete()
+    return result
 
 def skeptical_acceptability(args,atts,argname,semantics):
-    n_vars, clauses = get_encoding(args, atts,semantics)
-    arg_var = encoding.sat_var_from_arg_name(argname, args)
-
-    s = Solver(name='g4')
-    for clause in clauses:
-        s.add_clause(clause)
-        
-    s.add_clause([-arg_var])
-    
-    if s.solve():
-        s.delete()
-        return False
-    s.delete()
-    return True
+    reasoner = Reasoner(args, atts, semantics)
+    result = reasoner.skeptical_acceptability(argname)
+    reasoner.delete()
+    return result
 
 def skeptical_acceptability_set(args,atts,conjunct,semantics):
-    n_vars, clauses = get_encoding(args, atts,semantics)
-
+    reasoner = Reasoner(args, atts, semantics)
+    result = reasoner.skeptical_acceptability_set(conjunct)
+    reasoner.delete()
+    return result
 
-    s = Solver(name='g4')
-    for clause in clauses:
-        s.add_clause(clause)
-
-    new_clause = []
-    for argname in conjunct:
-        new_clause.append(-encoding.sat_var_from_arg_name(argname, args))
-    s.add_clause(new_clause)
-    
-    if s.solve():
-        s.delete()
-        return False
-    s.delete()
-    return True
+def covering_extensions(args,atts,semantics):
+    reasoner = Reasoner(args, atts, semantics)
+    result = reasoner.covering_extensions()
+    reasoner.delete()
+    return result
 
 def compute_some_extension(args,atts,semantics):
-    n_vars, clauses = get_encoding(args, atts,semantics)
-
-    s = Solver(name='g4')
-    for clause in clauses:
-        s.add_clause(clause)
-
-    if s.solve():
-        model = s.get_model()
-        s.delete()
-        return argset_from_model(model,args)
-
-    return "NO"
+    reasoner = Reasoner(args, atts, semantics)
+    result = reasoner.compute_some_extension()
+    reasoner.delete()
+    return result
         
 
-def extension_enumeration(args,atts,semantics):
-    n_vars, clauses = get_encoding(args, atts,semantics)
-    extensions = []
-
+### Returns the bitset of the extension given by a model, i.e. the integer whose i-th bit is set iff args[i] is in the extension
+def bitset_from_model(model, args):
+    bitset = 0
+    for literal in model:
+        if literal > 0 and literal <= len(args):
+            bitset |= 1 << (literal - 1)
+    return bitset
+
+def argset_from_bitset(bitset, args):
+    return [args[i] for i in range(len(args)) if (bitset >> i) & 1]
+
+### Enumerates the extensions lazily, as bitsets (see bitset_from_model)
+### Each model is blocked on the argument variables only, so an extension is yielded once even when the
+### encoding has auxiliary variables (the P variables of CO). The enumeration stops after limit extensions,
+### or when timeout seconds have elapsed (the current call to the solver is then interrupted).
+def iter_extensions(args, atts, semantics, limit=None, timeout=None):
+    clauses = get_encoding(args, atts, semantics)[1]
     s = Solver(name='g4')
-    for clause in clauses:
-        s.add_clause(clause)
-    
-    for model in s.enum_models():
-        extensions.append(argset_from_model(model,args))
-
-    s.delete()
-    return extensions
+    s.append_formula(clauses)
+    deadline = None
+    if timeout != None:
+        deadline = time.time() + timeout
+    nb_extensions = 0
+    try:
+        while limit == None or nb_extensions < limit:
+            if deadline == None:
+                result = s.solve()
+            else:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return
+                timer = threading.Timer(remaining, s.interrupt)
+                timer.start()
+                result = s.solve_limited(expect_interrupt=True)
+                timer.cancel()
+                s.clear_interrupt()
+            if not result:
+                return
+            model = s.get_model()
+            bitset = bitset_from_model(model, args)
+            nb_extensions += 1
+            yield bitset
+            # The variables of the arguments which do not occur in the encoding are blocked as well
+            s.add_clause([-(i+1) if (bitset >> i) & 1 else i+1 for i in range(len(args))])
+    finally:
+        s.delete()
 
-def extension_counting(args,atts,semantics):
-    return len(extension_enumeration(args,atts,semantics))
+### The stable extensions can be enumerated and counted component by component with method="scc" (see decomposition.py)
+enumeration_methods_list = ["sat", "scc"]
+
+def iter_extensions_by_method(args, atts, semantics, limit=None, timeout=None, method="sat"):
+    if method == "sat":
+        return iter_extensions(args, atts, semantics, limit, timeout)
+    if semantics != "ST":
+        sys.exit(f"The enumeration method {method} is only available for ST")
+    deadline = None
+    if timeout != None:
+        deadline = time.time() + timeout
+    return itertools.islice(decomposition.SCCSolver(args, atts).iter_extensions(deadline), limit)
+
+def extension_enumeration(args,atts,semantics,limit=None,timeout=None,method="sat"):
+    return [argset_from_bitset(bitset, args) for bitset in iter_extensions_by_method(args, atts, semantics, limit, timeout, method)]
+
+### Returns the number of extensions, or cap if there are at least cap extensions
+### With method="scc" and no timeout, the extensions are counted without being enumerated
+### (with a timeout, they are enumerated lazily and the ones found before the timeout are counted, as with method="sat")
+def extension_counting(args,atts,semantics,cap=None,timeout=None,method="sat"):
+    if method == "scc" and semantics == "ST" and timeout == None:
+        nb_extensions = decomposition.SCCSolver(args, atts).count_extensions()
+        if cap != None:
+            return min(cap, nb_extensions)
+        return nb_extensions
+    nb_extensions = 0
+    for bitset in iter_extensions_by_method(args, atts, semantics, cap, timeout, method):
+        nb_extensions += 1
+    return nb_extensions
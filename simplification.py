@@ -0,0 +1,199 @@
+import time
+
+### Simplification of the formula between the encoding and the solving steps (option -sp of main.py)
+### The encoders produce many unit clauses (negative target, strict version, no self attacks, constraints),
+### clauses satisfied by these units, and identical clauses (e.g. conflict-freeness for a == b).
+### The simplifier applies, in this order:
+## unit propagation -> the variables fixed by the unit clauses are removed from the formula
+## duplicate removal -> repeated literals, tautologies and identical clauses are removed
+## subsumption -> a clause containing all the literals of another clause is removed
+### The simplified formula is equisatisfiable with the initial one. A model of the simplified formula is turned
+### back into a model of the initial one by reconstruct(): the fixed variables get their value, and the variables
+### which no longer occur in the formula (they only occurred in removed clauses) are set to false.
+class Simplifier():
+
+    def __init__(self, clauses, nb_vars):
+        time_start = time.time()
+        self.nb_vars = nb_vars
+        # fixed[v] is the value of the variable v fixed by unit propagation
+        self.fixed = {}
+        self.unsatisfiable = False
+        # Number of soft clauses falsified by the fixed variables, see simplify_soft_clauses
+        self.soft_cost = 0
+
+        clauses = [list(clause) for clause in clauses]
+        self.nb_initial_clauses = len(clauses)
+        # An empty clause (e.g. a positive target when there is no extension) cannot be satisfied
+        if any(len(clause) == 0 for clause in clauses):
+            self.unsatisfiable = True
+        else:
+            self.propagate_units(clauses)
+        if self.unsatisfiable:
+            self.clauses = []
+        else:
+            clauses = self.remove_duplicates(clauses)
+            self.clauses = self.remove_subsumed(clauses)
+        self.simplification_time = time.time() - time_start
+
+    def value(self, literal):
+        value = self.fixed.get(abs(literal))
+        if value == None:
+            return None
+        return value == (literal > 0)
+
+    def propagate_units(self, clauses):
+        occurrences = {}
+        for index in range(len(clauses)):
+            for literal in clauses[index]:
+                occurrences.setdefault(literal, []).append(index)
+
+        queue = [clause[0] for clause in clauses if len(clause) == 1]
+        while len(queue) > 0 and not self.unsatisfiable:
+            literal = queue.pop()
+            value = self.value(literal)
+            if value == False:
+                self.unsatisfiable = True
+            if value != None:
+                continue
+            self.fixed[abs(literal)] = literal > 0
+            # The clauses containing the negation of the literal may have become unit or empty
+            for index in occurrences.get(-literal, []):
+                unassigned = []
+                satisfied = False
+                for other in clauses[index]:
+                    other_value = self.value(other)
+                    if other_value == True:
+                        satisfied = True
+                        break
+                    if other_value == None:
+                        unassigned.append(other)
+                if satisfied:
+                    continue
+                if len(unassigned) == 0:
+                    self.unsatisfiable = True
+                    break
+                if len(unassigned) == 1:
+                    queue.append(unassigned[0])
+
+    def remove_duplicates(self, clauses):
+        result = []
+        seen = set()
+        for clause in clauses:
+            simplified = self.simplify_clause(clause)
+            if simplified == None:
+                continue
+            if len(simplified) == 0:
+                self.unsatisfiable = True
+                return []
+            literals = set(simplified)
+            if any(-literal in literals for literal in literals):
+                continue
+            key = tuple(sorted(literals))
+            if key in seen:
+                continue
+            seen.add(key)
+            result.append(list(key))
+        return result
+
+    def remove_subsumed(self, clauses):
+        clauses.sort(key=len)
+        occurrences = {}
+        for index in range(len(clauses)):
+            for literal in clauses[index]:
+                occurrences.setdefault(literal, []).append(index)
+
+        removed = [False] * len(clauses)
+        for index in range(len(clauses)):
+            if removed[index]:
+                continue
+            clause = clauses[index]
+            if len(clause) == 0:
+                continue
+            literals = set(clause)
+            rarest = min(clause, key=lambda literal: len(occurrences[literal]))
+            for other in occurrences[rarest]:
+                if other != index and not removed[other] and len(clauses[other]) > len(clause) and literals.issubset(clauses[other]):
+                    removed[other] = True
+        return [clauses[index] for index in range(len(clauses)) if not removed[index]]
+
+    # Returns the clause without its literals falsified by the fixed variables,
+    # or None if one of its literals is satisfied
+    def simplify_clause(self, clause):
+        result = []
+        for literal in clause:
+            value = self.value(literal)
+            if value == True:
+                return None
+            if value == None:
+                result.append(literal)
+        return result
+
+    # Returns the soft clauses which are not decided by the fixed variables. The falsified ones
+    # are counted in soft_cost, which is added to the cost of the models (all the weights are 1).
+    def simplify_soft_clauses(self, soft_clauses):
+        result = []
+        for clause in soft_clauses:
+            simplified = self.simplify_clause(clause)
+            if simplified == None:
+                continue
+            if len(simplified) == 0:
+                self.soft_cost += 1
+            else:
+                result.append(simplified)
+        return result
+
+    # Returns a model of the initial formula built from a model of the simplified formula
+    def reconstruct(self, model):
+        values = {}
+        for literal in model:
+            values[abs(literal)] = literal > 0
+        values.update(self.fixed)
+        nb_vars = max(self.nb_vars, len(model))
+        return [v if values.get(v, False) else -v for v in range(1, nb_vars + 1)]
+
+
+### Engine of cegar.py solving the simplified formula: the clauses added during the CEGAR loop
+### (and the assumptions, for the engines supporting them) are simplified with the fixed variables,
+### and the models are reconstructed for the initial formula.
+### The other attributes (statistics) are the ones of the underlying engine.
+class SimplifyingEngine():
+
+    def __init__(self, engine, simplifier):
+        self.engine = engine
+        self.simplifier = simplifier
+        self.unsatisfiable = simplifier.unsatisfiable
+
+    def __getattr__(self, name):
+        return getattr(self.engine, name)
+
+    def add_clause(self, clause):
+        simplified = self.simplifier.simplify_clause(clause)
+        if simplified == None:
+            return
+        if len(simplified) == 0:
+            self.unsatisfiable = True
+        else:
+            self.engine.add_clause(simplified)
+
+    def solve(self, assumptions=[]):
+        if self.unsatisfiable:
+            return None
+        if len(assumptions) > 0:
+            simplified = self.simplifier.simplify_clause([-literal for literal in assumptions])
+            if simplified == None:
+                return None
+            model = self.engine.solve([-literal for literal in simplified])
+        else:
+            model = self.engine.solve()
+        if model == None:
+            return None
+        return self.simplifier.reconstruct(model)
+
+    @property
+    def cost(self):
+        if self.engine.cost == None:
+            return None
+        return self.engine.cost + self.simplifier.soft_cost
+
+    def delete(self):
+        self.engine.delete()
@@ -1,5 +1,25 @@
 import sys
 
+### List of argument names with constant-time index() and membership tests
+### It is built once per instance and can be used wherever a list of argument names is expected,
+### in particular for numbering the SAT variables. It must not be modified after its creation.
+class ArgumentList(list):
+
+    def __init__(self, args):
+        super().__init__(args)
+        self.ids = {}
+        for i in range(len(args)):
+            if args[i] not in self.ids:
+                self.ids[args[i]] = i
+
+    def index(self, argname):
+        if argname in self.ids:
+            return self.ids[argname]
+        raise ValueError(f"{argname} is not in list")
+
+    def __contains__(self, argname):
+        return argname in self.ids
+
 def is_credulously_accepted(argument, initial_extensions):
     for extension in initial_extensions:
         if argument in extension:
@@ -94,3 +114,23 @@ def parse_constraints_file(constraints_file):
             sys.exit(f"Line cannot be parsed ({apx_line})")
 
     return atts, non_atts
+
+## Parses a patch file written by main.py with -om diff
+## +att(x,y). the attack from x to y is added
+## -att(x,y). the attack from x to y is removed
+def parse_patch_file(patch_file):
+    with open(patch_file) as apxfile:
+        apx_lines = apxfile.read().splitlines()
+
+    added = []
+    removed = []
+    # Both kinds of lines have a one-character prefix, as the non-attacks of the constraints files
+    for apx_line in apx_lines:
+        if apx_line[0:4] == "+att":
+            added.append(parse_non_attack(apx_line))
+        elif apx_line[0:4] == "-att":
+            removed.append(parse_non_attack(apx_line))
+        elif not empty_line(apx_line):
+            sys.exit(f"Line cannot be parsed ({apx_line})")
+
+    return added, removed
@@ -0,0 +1,74 @@
+import collections
+import hashlib
+import json
+import os
+
+import numpy as np
+
+### LRU cache of the verdicts of the counterexample checks
+### The keys are fingerprints of the attack relation of the candidate AF and of the query, and the values are
+### the pairs (violation, extension) returned by credulous_encoding.find_counterexample.
+### The cache can be saved to a file and loaded again, so that several runs on the same instance share their verdicts.
+### With max_size <= 0, the cache is disabled: the file is neither loaded nor saved, and every lookup fails.
+class VerdictCache():
+
+    def __init__(self, max_size, cache_file=None):
+        self.max_size = max_size
+        self.entries = collections.OrderedDict()
+        self.nb_hits = 0
+        self.nb_misses = 0
+        if self.max_size > 0 and cache_file != None and os.path.exists(cache_file):
+            with open(cache_file) as json_file:
+                for key, (violation, extension) in json.load(json_file):
+                    if violation != None:
+                        violation = (violation[0], violation[1])
+                    self.entries[key] = (violation, extension)
+            # The entries are saved from the least to the most recently used one
+            self.trim()
+
+    # Returns a triple (found, violation, extension). When key has no entry, the verdict stored under fallback_key
+    # (e.g. the same AF with another query) is used if fallback_applies(violation) is True.
+    # Each lookup counts as one hit or one miss.
+    def lookup(self, key, fallback_key=None, fallback_applies=None):
+        if self.max_size <= 0:
+            return False, None, None
+        for candidate_key in [key, fallback_key]:
+            if candidate_key == None or candidate_key not in self.entries:
+                continue
+            violation, extension = self.entries[candidate_key]
+            if candidate_key == key or fallback_applies == None or fallback_applies(violation):
+                self.entries.move_to_end(candidate_key)
+                self.nb_hits += 1
+                return True, violation, extension
+        self.nb_misses += 1
+        return False, None, None
+
+    def store(self, key, violation, extension):
+        if self.max_size <= 0:
+            return
+        self.entries[key] = (violation, extension)
+        self.entries.move_to_end(key)
+        self.trim()
+
+    # Removes the least recently used entries beyond max_size
+    def trim(self):
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def save(self, cache_file):
+        if self.max_size <= 0:
+            return
+        with open(cache_file, 'w') as json_file:
+            json.dump(list(self.entries.items()), json_file)
+
+
+# Returns the fingerprint of an attack relation given by its (boolean) attack matrix
+def af_fingerprint(attack_matrix):
+    digest = hashlib.sha1(str(attack_matrix.shape).encode())
+    digest.update(np.packbits(attack_matrix).tobytes())
+    return digest.hexdigest()
+
+# Returns the fingerprint of the constraints checked on the candidate AFs
+def query_fingerprint(args, neg_target, conjunctive_positive, conjunctive_negative, forbidden_args):
+    query = [args, neg_target, conjunctive_positive, conjunctive_negative, forbidden_args]
+    return hashlib.sha1(json.dumps(query).encode()).hexdigest()